@@ -0,0 +1,61 @@
+# Actions are packed into one int, highest bits first:
+#   type (1 bit) | actor (8 bits) | target (8 bits) | item (12 bits) | quantity (24 bits)
+# actor/target are country indices, item is a template index for creates and a resource index for transfers
+# (see World_Tables.encode_action/decode_action for the names).  Codes hash and compare as plain ints and fit in an int64.
+CREATE = 0
+TRANSFER = 1
+ACTION_TYPES = ('Create', 'Transfer')
+
+QUANTITY_BITS = 24
+ITEM_BITS = 12
+COUNTRY_BITS = 8
+
+ITEM_SHIFT = QUANTITY_BITS
+TARGET_SHIFT = ITEM_SHIFT + ITEM_BITS
+ACTOR_SHIFT = TARGET_SHIFT + COUNTRY_BITS
+TYPE_SHIFT = ACTOR_SHIFT + COUNTRY_BITS
+
+QUANTITY_MASK = (1 << QUANTITY_BITS) - 1
+ITEM_MASK = (1 << ITEM_BITS) - 1
+COUNTRY_MASK = (1 << COUNTRY_BITS) - 1
+
+
+def pack_action(action_type, actor, target, item, quantity):
+    '''
+    pack the index form of an action into one int
+    :param action_type: CREATE or TRANSFER
+    :param quantity: whole number of units
+    '''
+    if action_type not in (CREATE, TRANSFER):
+        raise ValueError('Unknown command in option list')
+
+    if not (0 <= actor <= COUNTRY_MASK and 0 <= target <= COUNTRY_MASK and 0 <= item <= ITEM_MASK):
+        raise ValueError('Too many countries, templates or resources to encode the action.')
+
+    check_quantity(quantity)
+
+    return (action_type << TYPE_SHIFT) | (actor << ACTOR_SHIFT) | (target << TARGET_SHIFT) | (item << ITEM_SHIFT) | int(quantity)
+
+
+def check_quantity(quantity):
+    '''raises ValueError unless quantity fits the quantity field, also used to check CREATE_INTERVALS/MINIMUM_TRANSFER up front'''
+    if quantity != int(quantity) or not 0 <= quantity <= QUANTITY_MASK:
+        raise ValueError(f'Cannot encode quantity {quantity}, quantities must be whole numbers below {QUANTITY_MASK + 1}.')
+
+
+def unpack_action(code):
+    ''':return: Tuple (action type, actor, target, item, quantity) of indices'''
+    return (code >> TYPE_SHIFT,
+            (code >> ACTOR_SHIFT) & COUNTRY_MASK,
+            (code >> TARGET_SHIFT) & COUNTRY_MASK,
+            (code >> ITEM_SHIFT) & ITEM_MASK,
+            code & QUANTITY_MASK)
+
+
+def unpack_actions(codes):
+    '''vectorized unpack_action over an int64 array of codes, returns one array per field'''
+    return (codes >> TYPE_SHIFT,
+            (codes >> ACTOR_SHIFT) & COUNTRY_MASK,
+            (codes >> TARGET_SHIFT) & COUNTRY_MASK,
+            (codes >> ITEM_SHIFT) & ITEM_MASK,
+            codes & QUANTITY_MASK)
@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import argparse
+import tracemalloc
+
+from random import Random
+from time import perf_counter
+
+from frontier import Search_Frontier
+from search import Search_Config, run_search, make_root, SEARCH_ENGINES
+from world_state import World_State
+from config.simulation_configuration import (
+    MINIMUM_TRANSFER,
+    CREATE_INTERVALS,
+    MAX_DEPTH,
+    config_location,
+    )
+
+BASELINE_FILE = os.path.join(config_location, 'benchmark_baseline.json')
+
+# synthetic world sizes: (countries, resources, templates, search steps).  Options per node grow with countries x resources,
+# so the full searches on bigger worlds take fewer steps to keep the suite to a couple of minutes.
+WORLD_SIZES = {
+    'small': (3, 11, 4, 2000),
+    'medium': (10, 40, 20, 300),
+    'large': (30, 80, 40, 40),
+    }
+
+
+def synthetic_world(countries=3, resources=11, templates=4, seed=0):
+    '''
+    Seeded random World_State of the given size, built the same way as the world loaded from the config files.
+    Population is always resource 0, never transferable and every template gives back the population it uses.
+    :return: World_State
+    '''
+    rng = Random(seed)
+
+    country_names = [f'Country{n:03d}' for n in range(countries)]
+    resource_names = ['Population', *[f'Resource{n:03d}' for n in range(1, resources)]]
+
+    # the first half of the resources are raw (held at the start), the rest can only be made by templates
+    raw = resource_names[1:1 + (resources - 1) // 2]
+    made = resource_names[1 + (resources - 1) // 2:] or raw
+
+    weights = {'Weight': {'Population': 0}, 'Transferable': {'Population': False}}
+
+    for resource in resource_names[1:]:
+        weights['Weight'][resource] = round(rng.uniform(-0.8, 0.8), 2)
+        weights['Transferable'][resource] = rng.random() < 0.8
+
+    template_dict = {}
+
+    for n in range(templates):
+        population = rng.randint(1, 5)
+        inputs = {resource: rng.randint(1, 5) for resource in rng.sample(raw, min(len(raw), rng.randint(1, 4)))}
+        outputs = {resource: rng.randint(1, 3) for resource in rng.sample(made, min(len(made), rng.randint(1, 3)))}
+
+        inputs['Population'] = population
+        outputs['Population'] = population
+
+        template_dict[f'Create{n:03d}'] = {'Inputs': inputs, 'Outputs': outputs}
+
+    world_state = {}
+
+    for country in country_names:
+        world_state[country] = {'Population': rng.randint(25, 100)}
+        world_state[country].update({resource: rng.randint(0, 5000) for resource in raw})
+
+    return World_State.from_config(country_names, world_state, weights, template_dict)
+
+
+def benchmark_config(world, **kwargs):
+    '''Search_Config for world with output, progress and alerts turned off'''
+    countries = list(world.tables.country_names)
+
+    settings = dict(countries=countries, max_depth=max(MAX_DEPTH, len(countries)), output_dir=None, show_progress=False,
+                    new_best_score_alert=False, seed=0)
+    settings.update(kwargs)
+
+    return Search_Config(**settings)
+
+
+def time_scenario(run, repeat=3):
+    '''
+    run: function taking no arguments, returns the number of operations it performed
+    :return: dict with the best ops/sec of repeat timed calls and the peak traced memory (KB) of one more call
+    '''
+    best = 0
+
+    for _ in range(repeat):
+        started = perf_counter()
+        operations = run()
+        best = max(best, operations / (perf_counter() - started))
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'ops_per_sec': best, 'peak_kb': peak / 1024}
+
+
+def scenarios(size, seed=0, loops=200, steps=None):
+    '''
+    Timed scenarios for one synthetic world size, yields (name, function) pairs for time_scenario.
+    loops: calls per timing of the per node scenarios
+    steps: total_counter of the full searches, None for the steps of the size in WORLD_SIZES
+    '''
+    countries, resources, templates, size_steps = WORLD_SIZES[size]
+    steps = size_steps if steps is None else steps
+
+    world = synthetic_world(countries, resources, templates, seed=seed)
+    config = benchmark_config(world)
+
+    root = make_root(config, world, Random(seed))
+    country = root.country_dict[root.country_acting]
+    options = root.available_options(MINIMUM_TRANSFER, CREATE_INTERVALS)
+
+    def generate_options():
+        for _ in range(loops):
+            country.generate_country_options(root.country_dict.keys(), 'top_level_node', {}, MINIMUM_TRANSFER, CREATE_INTERVALS)
+
+        return loops
+
+    def price_options():
+        for _ in range(loops):
+            root.calculate_utilization_of_options(options)
+
+        return loops
+
+    def step_and_backtrack():
+        # the root's options built with get_options as the dfs search does, each taken with next_node_state (priced as it is
+        # taken) and undone with prev_node_state
+        frontier = Search_Frontier()
+        root.get_options(config.minimum_transfer, config.create_intervals, frontier, sort_method=config.sort_strategy,
+                         max_repeats=config.max_repeats)
+        moves = 0
+
+        while True:
+            child_node, frontier = root.next_node_state(frontier)
+
+            if child_node is None:
+                return moves
+
+            child_node.prev_node_state()
+            moves += 1
+
+    yield f'{size}/generate_country_options', generate_options
+    yield f'{size}/calculate_utilization_of_options', price_options
+    yield f'{size}/next_node_state+prev_node_state', step_and_backtrack
+
+    for engine in SEARCH_ENGINES:
+
+        def search(engine=engine):
+            return run_search(benchmark_config(world, total_counter=steps, search_engine=engine), world).steps
+
+        yield f'{size}/search_{engine}', search
+
+
+def check_utility_order(size, seed=0, nodes=200):
+    '''
+    Compares the lazy utility streams (Simulation_Node.utility_stream) with a stable sort of every priced option, in both
+    directions, at the nodes of a seeded random walk on a synthetic world.
+    nodes: number of nodes checked
+    :return: list of (depth, direction) where the orders differ
+    '''
+    countries, resources, templates, _ = WORLD_SIZES[size]
+    world = synthetic_world(countries, resources, templates, seed=seed)
+    config = benchmark_config(world)
+    rng = Random(seed)
+
+    node = make_root(config, world, Random(seed))
+    mismatches = []
+
+    for _ in range(nodes):
+        options = node.available_options(config.minimum_transfer, config.create_intervals)
+
+        if not options:
+            break
+
+        priced = node.calculate_utilization_of_options(options)
+
+        for descending in (True, False):
+            stream = node.utility_stream(options, descending=descending)
+            stream.price = node.price_option
+            streamed = [stream.pop() for _ in range(len(stream))]
+
+            if streamed != sorted(priced, key=lambda x: x[1], reverse=descending):
+                mismatches.append((node.depth, 'utility_first' if descending else 'utility_last'))
+
+        # the walk starts again from the root once it reaches the deepest node
+        if node.depth >= config.max_depth:
+            node = make_root(config, world, Random(seed))
+
+        else:
+            node = node.branch(rng.choice(options))
+
+    return mismatches
+
+
+def run_benchmarks(sizes=WORLD_SIZES, seed=0, loops=200, steps=None, repeat=3):
+    ''':return: dict of scenario name -> time_scenario result'''
+    results = {}
+
+    for size in sizes:
+        for name, run in scenarios(size, seed=seed, loops=loops, steps=steps):
+            results[name] = time_scenario(run, repeat=repeat)
+            print(f'{name:<50} {results[name]["ops_per_sec"]:>14,.1f} ops/sec {results[name]["peak_kb"]:>12,.1f} KB peak')
+
+    return results
+
+
+def compare(results, baseline, tolerance=0.1):
+    '''
+    Prints each scenario against the baseline.
+    tolerance: fraction of baseline ops/sec a scenario may lose before it counts as a regression
+    :return: list of regressed scenario names
+    '''
+    regressions = []
+
+    print(f'\n{"Scenario":<50} {"ops/sec":>14} {"baseline":>14} {"change":>8}')
+
+    for name, result in results.items():
+
+        if name not in baseline:
+            print(f'{name:<50} {result["ops_per_sec"]:>14,.1f} {"-":>14} {"new":>8}')
+            continue
+
+        change = result['ops_per_sec'] / baseline[name]['ops_per_sec'] - 1
+        print(f'{name:<50} {result["ops_per_sec"]:>14,.1f} {baseline[name]["ops_per_sec"]:>14,.1f} {change:>+8.1%}')
+
+        if change < -tolerance:
+            regressions.append(name)
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the simulation hot paths and full searches on synthetic worlds.')
+    parser.add_argument('--sizes', nargs='+', default=list(WORLD_SIZES), choices=list(WORLD_SIZES), help='synthetic world sizes to run')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic worlds and searches')
+    parser.add_argument('--loops', type=int, default=200, help='calls per timing of the per node scenarios')
+    parser.add_argument('--steps', type=int, default=None, help='total_counter of the full searches, defaults to the steps in WORLD_SIZES')
+    parser.add_argument('--repeat', type=int, default=3, help='timings per scenario, the best is kept')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='baseline file to compare against, a machine local file recorded with --save-baseline (not committed)')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed slowdown against the baseline before failing')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--check-order', type=int, default=None, metavar='NODES',
+                        help='instead of timing, check the lazy utility order against a full sort at this many nodes per size')
+    args = parser.parse_args()
+
+    if args.check_order is not None:
+        failed = False
+
+        for size in args.sizes:
+            mismatches = check_utility_order(size, seed=args.seed, nodes=args.check_order)
+            failed = failed or bool(mismatches)
+            print(f'{size:<10} {len(mismatches)} mismatched orders {mismatches[:5]}')
+
+        sys.exit(1 if failed else 0)
+
+    results = run_benchmarks(args.sizes, seed=args.seed, loops=args.loops, steps=args.steps, repeat=args.repeat)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=4)
+
+        print(f'\nBaseline saved to {args.baseline}')
+
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), tolerance=args.tolerance)
+
+        if regressions:
+            print(f'\n{len(regressions)} scenario(s) slower than the baseline: {", ".join(regressions)}')
+            sys.exit(1)
@@ -0,0 +1,121 @@
+import numpy as np
+
+
+class Utility_Bound(object):
+    '''
+    Optimistic (admissible) bound on the global utility of any node below a node, used to prune subtrees that cannot beat the best node.
+    Each step changes weighted sums by a bounded amount: the acting country creates at most max(create_intervals) units of a template
+    (fewer if the world does not hold the inputs) or sends away at most max(minimum_transfer) units of a resource, any other country
+    receives at most that many units.  Resources no template makes never grow past their world total, so they can only be moved while
+    the world holds enough of them.  A country's utility only changes when it creates, so the best it can reach is its current utility
+    or its bounded weighted sum over population at one of its remaining turns, times the discount of that turn.
+    Everything but the current weighted sums and utilities is worked out once from the root world, a check is a few vector operations.
+    world: World_State at the root of the search
+    turn_tracker: depth -> acting country, see util.get_turn_tracker
+    max_depth: deepest node of the search
+    discount_rate: function of depth giving the discount of actions taken there (Simulation_Node.get_discount_rate)
+    '''
+
+    def __init__(self, world, turn_tracker, max_depth, discount_rate, minimum_transfer, create_intervals):
+        tables = world.tables
+
+        self.checks = 0
+        self.pruned = 0
+
+        # the bound holds weighted sums over a fixed population, if population can move or be made there is nothing to bound
+        self.enabled = tables.fixed_population
+
+        acting_gain, receive_gain, create_gain = self.step_gains(world, minimum_transfer, create_intervals)
+
+        countries = len(tables.country_names)
+        acting = [tables.country_index[turn_tracker[depth]] for depth in range(1, max_depth)]
+        population = world.resources[:, tables.population_index]
+
+        turns = max(1, -(-max_depth // countries))
+
+        # per depth, a (countries x turns) matrix for every later turn of each country, where its utility can change: the largest
+        # weighted sum gain from the depth up to and including its create at that turn, and discount / population.
+        # Unused slots gain -inf so they never win the max.
+        self.turns = []
+
+        for depth in range(max_depth + 1):
+            gained = np.full((countries, turns), -np.inf)
+            scale = np.ones((countries, turns))
+            own_turns = np.zeros(countries, dtype=np.int64)
+
+            for later in range(max(depth, 1), max_depth):
+                actor = acting[later - 1]
+                turn = own_turns[actor]
+
+                gained[actor, turn] = turn * acting_gain + (later - depth - turn) * receive_gain + create_gain
+                scale[actor, turn] = discount_rate(later) / population[actor]
+
+                own_turns[actor] += 1
+
+            self.turns.append((gained, scale))
+
+    def __repr__(self):
+        return f'{type(self).__name__}(Enabled={self.enabled}, Checks={self.checks}, Pruned={self.pruned})'
+
+    @staticmethod
+    def step_gains(world, minimum_transfer, create_intervals):
+        '''
+        largest weighted sum one step can add to the acting country (create, or give away a resource of negative weight),
+        to a country receiving a transfer and to a country creating
+        :return: Tuple (acting gain, receive gain, create gain)
+        '''
+        tables = world.tables
+        totals = world.resources.sum(axis=0)
+
+        # resources made by some template can grow without limit, the others only move between countries or get used up
+        made = np.zeros(len(tables.resource_names), dtype=bool)
+
+        for template in tables.template_names:
+            made |= tables.template_outputs[template] > 0
+
+        # units of each template the fixed inputs in the world and the largest population could pay for
+        limited = tables.template_input_mask & ~made
+        limited[:, tables.population_index] = tables.template_input_mask[:, tables.population_index]
+        totals_or_population = totals.copy()
+        totals_or_population[tables.population_index] = world.resources[:, tables.population_index].max()
+
+        affordable = np.divide(totals_or_population, tables.template_input_matrix, out=np.full(tables.template_input_matrix.shape, np.inf),
+                               where=limited)
+        created = np.minimum(affordable.min(axis=1, initial=np.inf), max(create_intervals, default=0))
+
+        create_gain = max(0.0, float((tables.template_weighted_delta_array * created).max(initial=0.0)))
+
+        # fixed resources only move while the world holds at least the smallest transfer
+        moved = np.where(made, max(minimum_transfer, default=0), np.minimum(totals, max(minimum_transfer, default=0)))
+        moved[~made & (totals < min(minimum_transfer, default=0))] = 0
+        moved_weights = (tables.weights * moved)[tables.transferable]
+
+        acting_gain = max(create_gain, float(-moved_weights.min(initial=0.0)))
+        receive_gain = max(0.0, float(moved_weights.max(initial=0.0)))
+
+        return acting_gain, receive_gain, create_gain
+
+    def upper_bound(self, node):
+        '''largest global utility any node below node can reach, inf when the world cannot be bounded'''
+        if not self.enabled:
+            return np.inf
+
+        world = node.world
+        gained, scale = self.turns[node.depth]
+
+        reachable = ((world.current_weighted_sums()[:, None] + gained) * scale).max(axis=1)
+
+        return float(np.maximum(world.utilities, reachable).mean())
+
+    def prune(self, node, best_utility):
+        '''True if nothing below node can beat best_utility, counts the checks and cuts'''
+        self.checks += 1
+
+        if self.upper_bound(node) + 1e-9 <= best_utility:
+            self.pruned += 1
+            return True
+
+        return False
+
+    def stats(self):
+        return {'checks': self.checks, 'pruned': self.pruned}
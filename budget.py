@@ -0,0 +1,98 @@
+import os
+import sys
+
+from time import monotonic
+
+try:
+    import resource     # not available on Windows, memory limits are ignored there
+except ImportError:
+    resource = None
+
+
+def current_memory_mb():
+    '''resident memory of this process right now in MB, None if it cannot be measured on this platform (only Linux has /proc)'''
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+
+    except (OSError, ValueError, IndexError):
+        return None
+
+    return pages * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def peak_memory_mb():
+    '''peak resident memory of this process over its lifetime in MB, None if it cannot be measured on this platform'''
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return peak / 2**20
+
+    return peak / 2**10
+
+
+class Search_Budget(object):
+    '''
+    Wall clock and memory budget for a search.  Checked from the hot loop, so the clock and memory are only read every check_interval calls.
+    time_limit: seconds from creation, None for no limit
+    memory_limit_mb: ceiling on current resident memory of the process, None for no limit.
+        Where current memory cannot be read the process peak is used instead, but only once it has grown past the peak at creation,
+        so memory used by earlier work in the same process never stops a new search.
+    '''
+
+    def __init__(self, time_limit=None, memory_limit_mb=None, check_interval=100):
+        self.time_limit = time_limit
+        self.memory_limit_mb = memory_limit_mb
+        self.check_interval = max(1, check_interval)
+
+        self.started = monotonic()
+        self.deadline = None if time_limit is None else self.started + time_limit
+        self.calls = 0
+        self.stop_reason = None
+
+        self.starting_peak_mb = peak_memory_mb() if memory_limit_mb is not None else None
+
+    def __repr__(self):
+        return f'{type(self).__name__}(Time Limit={self.time_limit}, Memory Limit MB={self.memory_limit_mb}, Elapsed={self.elapsed():.2f}, Stop Reason={self.stop_reason})'
+
+    def elapsed(self):
+        return monotonic() - self.started
+
+    def exhausted(self):
+        '''
+        :return: 'time' or 'memory' once a limit is hit (and on every call after that), otherwise None
+        '''
+        if self.stop_reason is not None:
+            return self.stop_reason
+
+        self.calls += 1
+
+        # first call always checks, so a zero budget stops straight away
+        if self.calls % self.check_interval != 1 and self.check_interval != 1:
+            return None
+
+        if self.deadline is not None and monotonic() >= self.deadline:
+            self.stop_reason = 'time'
+
+        elif self.memory_limit_mb is not None and (self.memory_mb() or 0) >= self.memory_limit_mb:
+            self.stop_reason = 'memory'
+
+        return self.stop_reason
+
+    def memory_mb(self):
+        '''memory counted against the limit: current resident memory, or the process peak if it has risen since creation, else None'''
+        current = current_memory_mb()
+
+        if current is not None:
+            return current
+
+        peak = peak_memory_mb()
+
+        if peak is None or self.starting_peak_mb is None or peak <= self.starting_peak_mb:
+            return None
+
+        return peak
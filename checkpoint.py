@@ -0,0 +1,118 @@
+import os
+import pickle
+
+
+class Search_Checkpoint(object):
+    '''
+    Where a search stopped, enough to inspect it or pick it up again (see search.resume_search).
+    path: actions (event tuples) from the initial world to the current node
+    frontier_counts: events already performed below each node on the path, one dict per path node starting with the root
+        (see Search_Frontier, entries are keyed by node there).  None for engines without a frontier.
+    option_streams: options not yet taken at each node on the path, one Option_Stream/Utility_Stream snapshot (or None when the node
+        has not generated its options) per path node starting with the root.  None for engines without a frontier.
+    best_path: actions from the initial world to the best node found
+    best_utility: global utility of the best node found
+    steps: steps taken when the checkpoint was made, also the position in the utility tracker
+    stop_reason: why the search stopped, see Search_Result.  None for checkpoints taken while running.
+    rng_state: state of the search random.Random (see Search_Config.seed) when the checkpoint was made
+    seed: seed the search was started with
+    transposition_state: (keys in LRU order, hits, misses, evictions) of the Transposition_Table, None if disabled
+    saved_timestamp: output file prefix of the search, a resumed search keeps writing to the same files
+    transaction_offset: size in bytes of the best node transaction list at the checkpoint, a resume truncates it there.
+        None when no output files are written.
+    '''
+
+    def __init__(self, path, frontier_counts, best_path, best_utility, steps, stop_reason=None, rng_state=None,
+                 transposition_state=None, saved_timestamp=None, seed=None, option_streams=None, transaction_offset=None):
+        self.path = path
+        self.frontier_counts = frontier_counts
+        self.option_streams = option_streams
+        self.best_path = best_path
+        self.best_utility = best_utility
+        self.steps = steps
+        self.stop_reason = stop_reason
+        self.rng_state = rng_state
+        self.transposition_state = transposition_state
+        self.saved_timestamp = saved_timestamp
+        self.transaction_offset = transaction_offset
+        self.seed = seed
+
+    def __repr__(self):
+        return f'''
+        {type(self).__name__}(
+            Depth={len(self.path) + 1}
+            Best Utility={self.best_utility}
+            Steps={self.steps}
+            Stop Reason={self.stop_reason}
+            )
+            '''
+
+    @classmethod
+    def from_search(cls, node, frontier, best_node, steps, stop_reason=None, transpositions=None, saved_timestamp=None, seed=None,
+                    transaction_offset=None):
+        '''
+        node: current Simulation_Node of the search
+        frontier: Search_Frontier of the search or None
+        best_node: best Simulation_Node so far
+        transpositions: Transposition_Table of the search or None
+        transaction_offset: see Search_Log.transaction_offset
+        '''
+        frontier_counts = None
+        option_streams = None
+
+        if frontier is not None:
+            path_nodes = []
+
+            while node is not None:
+                path_nodes.append(node)
+                node = node.parent_node
+
+            path_nodes.reverse()
+
+            # events taken at the root are keyed 'top_level_node', events taken at any other node are keyed by its parent
+            frontier_counts = [dict(frontier.get('top_level_node', {}))]
+            frontier_counts.extend(dict(frontier.get(n.hex_name, {})) for n in path_nodes)
+
+            # the streams keep being consumed by the search, snapshot them
+            option_streams = [n.possible_actions[n.country_acting].snapshot() if n.country_acting in n.possible_actions else None
+                              for n in path_nodes]
+
+            node = path_nodes[-1]
+
+        transposition_state = None
+
+        if transpositions is not None:
+            transposition_state = (list(transpositions.table), transpositions.hits, transpositions.misses, transpositions.evictions)
+
+        return cls(node.extract_transaction_sequence() if node is not None else [],
+                   frontier_counts,
+                   best_node.extract_transaction_sequence(),
+                   best_node.global_utility,
+                   steps,
+                   stop_reason=stop_reason,
+                   rng_state=best_node.rng.getstate(),
+                   transposition_state=transposition_state,
+                   saved_timestamp=saved_timestamp,
+                   seed=seed,
+                   option_streams=option_streams,
+                   transaction_offset=transaction_offset)
+
+    def save(self, filename):
+        '''write the checkpoint as a binary pickle, through a temporary file so a crash never leaves a half written checkpoint'''
+        temp_filename = filename + '.tmp'
+
+        with open(temp_filename, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(temp_filename, filename)
+
+    @classmethod
+    def load(cls, filename):
+
+        with open(filename, 'rb') as f:
+            checkpoint = pickle.load(f)
+
+        if not isinstance(checkpoint, cls):
+            raise ValueError(f'{filename} is not a search checkpoint.')
+
+        return checkpoint
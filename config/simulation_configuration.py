@@ -1,5 +1,6 @@
 # update if running script from a file where configurations are not present (should not be necessary)
 config_location = './config'
+CONFIG_CACHE = True                         # reuse the parsed config files (config/.config_cache.pkl) until one of them changes
 
 #################
 # Configuration
@@ -14,6 +15,14 @@ MINIMUM_TRANSFER = list(range(200, 50, -25))
 CREATE_INTERVALS = list(range(200, 0, -25))
 MAX_REPEATS = 1                             # model allows for repetition of actions at same country/depth state, but limits number of repeats to break loops
 MAX_DEPTH = 18
+FRONTIER_MAX_EVENTS = 1000000              # cap on repeat counts kept for nodes on the active search path, None for no cap
+TRANSPOSITION_TABLE_SIZE = 100000           # explored states remembered so identical worlds reached by a different order of actions are not re-expanded.  0 to disable.
+OPTION_CACHE_SIZE = 10000                   # country resource states whose feasible options are remembered, countries keep coming back to the same resources.  0 to disable.
+BRANCH_AND_BOUND = True                     # dfs skips subtrees whose optimistic utility bound cannot beat the best node found so far
+
+# Utility config
+INCREMENTAL_UTILITY = True                  # keep a running weighted sum per country instead of re-summing every resource on each update and pricing
+VERIFY_UTILITY = False                      # cross-check incremental utility against a full recompute, raises on mismatch.  Slow, use for debugging.
 
 # Country config
 # Designate "your" country.  This will come with a custom configuration in Part2.
@@ -24,10 +33,39 @@ countries = ['Atlantis', 'Brobdingnag', 'Carpania']   # 'Atlantis', 'Brobdingnag
 # Sort Strategy config
 # valid values: create_first, std, utility_first, utility_first_and_reduce, utility_last, transfer_first, random, random_and_reduce
 SORT_STRATEGY = 'utility_first_and_reduce'
+SEED = None                                 # seed of the search random number generator, same seed and config give the same run.  None draws a seed (written to the metadata file)
+
+# Search engine config
+# valid values: dfs (depth first, ordered by SORT_STRATEGY), beam, best_first, mcts
+SEARCH_ENGINE = 'dfs'
+BEAM_WIDTH = 10                             # nodes kept at each depth when SEARCH_ENGINE = 'beam'
+MCTS_EXPLORATION = 1.4                      # UCT exploration constant when SEARCH_ENGINE = 'mcts', higher explores more
+
+# Budget config, the search returns the best node found so far once any limit is hit
+TIME_LIMIT = None                           # wall clock budget in seconds, None to stop on total_counter only
+MEMORY_LIMIT_MB = None                      # stop once process memory reaches this many MB, None for no limit
+BUDGET_CHECK_INTERVAL = 100                 # steps between checks of the clock and memory
+
+# Instrumentation config
+INSTRUMENT = False                          # time each phase of the search (option generation, pricing, sorting, transitions, backtracks, output) and print a summary at the end
+PROFILE = None                              # 'cprofile' or 'tracemalloc' to run the search under a profiler, the capture is saved next to the other output files
+
+# Output config
+LOG_BUFFER_SIZE = 65536                     # steps buffered in memory before the node log is written (on a background thread)
+
+# Checkpoint config (dfs engine), checkpoints are written to sim_runs as {TIMESTAMP}_checkpoint.pkl
+CHECKPOINT_INTERVAL = None                  # steps between checkpoints, None to disable.  Resume with: python tradesim.py --resume <checkpoint file>
 
 # used to limit number of steps taken in simulation.  Test with a low number then increase to set the upper bound.
 total_counter = 10000
 
+# Orchestrator config (orchestrator.py runs many independent searches in parallel)
+TOTAL_RUNS = 25                             # number of independent searches
+PARALLEL_WORKERS = None                     # worker processes, None uses every core
+BASE_SEED = None                            # run n is seeded with BASE_SEED + n, None picks a random base seed
+LEADERBOARD_SIZE = 10                       # best runs kept in the merged leaderboard file
+AGGREGATE_TOP_K = 100                       # distinct models kept by data_extract.py when merging the sim_runs transaction lists
+
 #################
 ## End of configuration
 #################
@@ -1,40 +1,43 @@
-import json
-import pandas as pd
+import numpy as np
+
+from math import isclose
+
+from action import CREATE, TRANSFER, ITEM_SHIFT, TARGET_SHIFT, pack_action
+
+from config.simulation_configuration import (
+    INCREMENTAL_UTILITY,
+    VERIFY_UTILITY,
+    )
 
 class Country():
     '''
-    country_name: path to CSV containing state data
-    init_state_data: path to CSV file containing state data
-    init_resource_weights: path to CSV file containing resource weight data
-    templates = 'templates.json': path to JSON object that represents templates (blueprints)
+    View over one country (row) of a World_State.  Holds no resources of its own, changes write through to the world array.
+    country_name: name of the country, must be one of world_state.tables.country_names
+    world_state: World_State containing the resources of every country in the simulation
     '''
 
-    def __init__(self, country_name: str, init_state_data: str, init_resource_weights: str, templates: str = 'templates.json'):
+    incremental_utility = INCREMENTAL_UTILITY
+    verify_utility = VERIFY_UTILITY
 
-        self.name = country_name
+    def __init__(self, country_name: str, world_state):
 
-        world_state = self.csv_to_json_parser(init_state_data, orient='index')
-        self.resources = world_state[country_name]
+        self.name = country_name
+        self.world = world_state
+        self.tables = world_state.tables
+        self.index = self.tables.country_index[country_name]
 
-        weights = self.csv_to_json_parser(init_resource_weights, orient='columns')
+        # numpy row view into world_state.resources, indexed by tables.resource_index
+        self.resources = world_state.resources[self.index]
 
-        self.resource_weights = weights['Weight']
-        self.resource_transferable = weights['Transferable']
+        # shared, read only tables.  Never copied per country or per node.
+        self.resource_weights = self.tables.resource_weights
+        self.resource_transferable = self.tables.resource_transferable
+        self.templates = self.tables.templates
         self.country_frontier = dict()
 
-        # if we encouter resources that do not have defined weights/transferaility, assume weight 0 and not transferable.
-        for resource in self.resources:
-            if resource not in self.resource_transferable:
-                self.resource_transferable[resource] = False
-            if resource not in self.resource_weights:
-                self.resource_weights[resource] = 0
-
-        with open(templates) as input_file:
-            x = json.loads(input_file.read())
-            self.templates = x
-
-        self.current_utility = 0
-        self.update_util(util_init=True)
+        # action codes of this country with item, target and quantity left at 0, see action.py
+        self.create_base = pack_action(CREATE, self.index, self.index, 0, 0)
+        self.transfer_base = pack_action(TRANSFER, self.index, 0, 0, 0)
 
     def __repr__(self):
         return f'''
@@ -42,54 +45,90 @@ class Country():
             Name={self.name}
             Resource Weights={self.resource_weights},
             Resource Transferable={self.resource_transferable},
-            Resources={self.resources}
+            Resources={self.resource_dict()}
             Templates={self.templates.keys()}
             )
             '''
 
-    def __add__(self, transform_input: dict):
+    @property
+    def current_utility(self):
+        return float(self.world.utilities[self.index])
+
+    @current_utility.setter
+    def current_utility(self, value):
+        self.world.utilities[self.index] = value
+
+    def resource_dict(self):
+        '''resources held by the country as a dict of resource -> amount'''
+        return dict(zip(self.tables.resource_names, self.resources.tolist()))
+
+    @property
+    def weighted_sum(self):
+        return float(self.world.weighted_sums[self.index])
+
+    def __add__(self, transform_input):
         '''
         takes in dictionary (input/output level from JSON) and adds values to current country
-        :param transform_input:
+        the running weighted sum is adjusted by the touched resources only
+        :param transform_input: dict of resource -> amount, or a vector over tables.resource_names
         :return:
         '''
 
+        if isinstance(transform_input, np.ndarray):
+            self.resources += transform_input
+            self.world.weighted_sums[self.index] += transform_input @ self.tables.weights
+            return
+
         for resource in transform_input.keys():
-            if resource in self.resources:
-                self.resources[resource] = self.resources[resource] + transform_input[resource]
-            else:
-                self.resources[resource] = transform_input[resource]
+            n = self.tables.resource_index[resource]
+            self.resources[n] += transform_input[resource]
+            self.world.weighted_sums[self.index] += transform_input[resource] * self.tables.weights[n]
 
-    def __sub__(self, transform_input:dict):
+    def __sub__(self, transform_input):
         # takes in dictionary and removes values from current country
         # check to be performed outside this function call
 
         # only log subtractions (transfers) and transforms, "received from" is reduntant
 
+        if isinstance(transform_input, np.ndarray):
+            self.resources -= transform_input
+            self.world.weighted_sums[self.index] -= transform_input @ self.tables.weights
+            return
+
         for resource in transform_input.keys():
-            self.resources[resource] = self.resources[resource] - transform_input[resource]
+            n = self.tables.resource_index[resource]
+            self.resources[n] -= transform_input[resource]
+            self.world.weighted_sums[self.index] -= transform_input[resource] * self.tables.weights[n]
 
 
     def update_util(self, util_init=False, verbose=False, discount=1):
 
-        temp_util = 0
+        if self.incremental_utility:
+            temp_util = self.weighted_sum / self.resources[self.tables.population_index] * discount
 
-        for k, v in self.resources.items():
+            if self.verify_utility:
+                full_util = self.shadow_util(discount=discount)
 
-            if k not in self.resource_weights.keys():
-                #todo consider handling this differently, right now we will ignore from calculation
-                pass
-                # raise ValueError(f'Missing key {k} from resource weight table.')
-            else:
-                temp_util = temp_util + (v * self.resource_weights[k])
+                if not isclose(temp_util, full_util, rel_tol=1e-9, abs_tol=1e-9):
+                    raise ValueError(f'[{self.name}] Incremental utility {temp_util} does not match full recompute {full_util}.')
 
-        temp_util = (temp_util / self.resources['Population']) * discount
+        else:
+            temp_util = self.shadow_util(discount=discount)
 
         if not util_init and verbose:
             print(f'[{self.name}] Utility updated {self.current_utility} -> {temp_util}')
 
         self.current_utility = temp_util
 
+    def shadow_util(self, delta=None, discount=1):
+        '''
+        utility the country would have after applying delta, without changing the country.  Always a full recompute.
+        :param delta: vector over tables.resource_names, None to price the current resources
+        '''
+        resources = self.resources if delta is None else self.resources + delta
+
+        return float(self.tables.utility(resources, discount=discount))
+
     # Evaluate one move ahead, calculating the expected utility of completing it
     def expected_util(selp):
         pass
@@ -104,84 +143,74 @@ class Country():
             List of Tuples indicating resource shortages that caused the check to fail
         '''
 
-        test_pass = True
         insufficient_resources = []
 
-        necessary_input_resources = self.templates[create_action]['Inputs'].keys()
-
-        for resource in necessary_input_resources:
-
-            cost_to_build = self.templates[create_action]['Inputs'][resource] * multiplier
-            current_resource = self.resources[resource]
+        for resource, amount in self.templates[create_action]['Inputs'].items():
 
-            if resource in self.resources:
-                if current_resource < cost_to_build:
-                    shortage = current_resource - cost_to_build
-                    insufficient_resources.append((resource, shortage))
-                    test_pass = False
+            cost_to_build = amount * multiplier
+            current_resource = self.resources[self.tables.resource_index[resource]]
 
-                if current_resource >= cost_to_build:
-                    shortage = 0
-
-            elif resource not in self.resources:
-                shortage = -cost_to_build
+            if current_resource < cost_to_build:
+                shortage = current_resource - cost_to_build
                 insufficient_resources.append((resource, shortage))
-                test_pass = False
 
-            else:
-                raise ValueError("Unexpected logic encountered, this should never happen. lLkKodZdhk")
+        test_pass = len(insufficient_resources) == 0
 
         return (test_pass, multiplier, insufficient_resources)
 
-    def csv_to_json_parser(self, csv_data, orient):
-
-        csv_data = pd.read_csv(csv_data, index_col=[0])
-
-        return json.loads(csv_data.to_json(orient=orient, indent=4))
-
-    def generate_country_options(self, world_list, parent_node_id, frontier, minimum_transfer=[200], intervals_to_check=[100,10], max_repeats=3):
-
-        options = []
-
-        for next_template in self.templates.keys():
-
-            for multiplier in intervals_to_check:
+    def generate_country_options(self, world_list, parent_node_id, frontier, minimum_transfer=[200], intervals_to_check=[100,10], max_repeats=3,
+                                 cache=None):
+        '''
+        All feasible Create and Transfer options for this country that have not been repeated too often at parent_node_id.
+        :param cache: Option_Cache of the search, feasible options are only worked out once per resource vector
+        :return: list of action codes (see action.py), creates first
+        '''
+        seen_at_parent = frontier.get(parent_node_id, {})
 
-                resources_exist, qty_to_make, resource_shortage = self.check_resources(next_template, multiplier)
+        if cache is None:
+            creates, transfers = self.feasible_options(world_list, minimum_transfer, intervals_to_check)
 
-                if resources_exist:
+        else:
+            key = cache.key(self, minimum_transfer, intervals_to_check)
+            feasible = cache.get(key)
 
-                    new_option = ('Create', self.name, self.name, next_template, qty_to_make)
-                    seen_before = frontier.get(parent_node_id, {}).get(new_option, 0)
-                    # seen_before = self.country_frontier.get(parent_node_id, {}).get(new_option, 0)
-                    # seen_before = self.country_frontier.get(current_depth, {}).get(new_option, 0)
+            if feasible is None:
+                feasible = self.feasible_options(world_list, minimum_transfer, intervals_to_check)
+                cache.put(key, feasible)
 
-                    if seen_before <= max_repeats:
-                        options.append(new_option)
+            creates, transfers = feasible
 
-        # check for transfers
-        for resource in self.resources.keys():
+        # nothing tried at this parent yet, every feasible option is allowed
+        if not seen_at_parent and max_repeats > 0:
+            return creates + transfers
 
-            for local_min in minimum_transfer:
+        options = [x for x in creates if seen_at_parent.get(x, 0) <= max_repeats]
+        options.extend(x for x in transfers if seen_at_parent.get(x, 0) < max_repeats)
 
-                if self.resources[resource] >= local_min and self.resource_transferable.get(resource, False) is True:
+        return options
 
-                    for other_country in world_list:
+    def feasible_options(self, world_list, minimum_transfer, intervals_to_check):
+        '''
+        Every Create and Transfer the country's resources allow.  Computed for every template/interval and resource/minimum pair at once,
+        then only feasible options are visited.
+        :return: Tuple (creates, transfers), lists of action codes.  Shared with the Option_Cache, do not change them.
+        '''
+        tables = self.tables
 
-                        if other_country == self.name:
-                            # ensure transfers to self do not occur but transfers to other countries are considered.
-                            pass
-                        else:
-                            # max_resources = country.resources[resource]
-                            # options.append((resource, max_resources))
+        # check for creates: a multiplier is feasible if it is no more than the template's max multiplier
+        max_multipliers = tables.max_template_multipliers(self.resources)
+        intervals = np.asarray(intervals_to_check, dtype=np.int64)
 
-                            new_option = ('Transfer', self.name, other_country, resource, local_min)
-                            seen_before = frontier.get(parent_node_id, {}).get(new_option, 0)
-                            # seen_before = self.country_frontier.get(parent_node_id, {}).get(new_option, 0)
-                            # seen_before = self.country_frontier.get(current_depth, {}).get(new_option, 0)
+        t, n = np.nonzero(intervals[None, :] <= max_multipliers[:, None])
+        creates = (self.create_base + (t.astype(np.int64) << ITEM_SHIFT) + intervals[n]).tolist()
 
-                            if seen_before < max_repeats:
+        # check for transfers, one code per feasible resource/minimum pair and other country
+        targets = np.array([tables.country_index[x] for x in world_list if x != self.name], dtype=np.int64)  # ensure transfers to self do not occur
+        minimums = np.asarray(minimum_transfer, dtype=np.int64)
+        amounts = self.resources[tables.transferable_indices]
 
-                                options.append(new_option)
+        r, n = np.nonzero(amounts[:, None] >= minimums[None, :])
+        pairs = self.transfer_base + (tables.transferable_indices[r].astype(np.int64) << ITEM_SHIFT) + minimums[n]
+        transfers = (pairs[:, None] + (targets[None, :] << TARGET_SHIFT)).ravel().tolist()
 
-        return options
\ No newline at end of file
+        return creates, transfers
@@ -1,18 +1,112 @@
-import glob, os
-import pandas as pd
+import os
+import csv
+import glob
+import heapq
 
-path = "./sim_runs"
-all_files = glob.glob(os.path.join(path, "*_transaction_list.csv"))
+from concurrent.futures import ProcessPoolExecutor
 
+from search_log import TRANSACTION_LOG_HEADERS
+from config.simulation_configuration import (
+    AGGREGATE_TOP_K,
+    PARALLEL_WORKERS,
+    )
 
-print(all_files)
 
-df_list = []
+def read_models(filename, top_k=AGGREGATE_TOP_K):
+    '''
+    Read one {TIMESTAMP}_best_node_transaction_list.csv, runs in a worker process.
+    :return: list of (global utility, depth, model id, transactions) for the best top_k distinct transaction sequences in the file
+    '''
+    models = {}
 
-for file in all_files:
-    df = pd.read_csv(file, index_col=None, header=0)
-    df_list.append(df)
+    with open(filename, newline='') as f:
 
-frame = pd.concat(df_list, axis=0, ignore_index=True)
+        reader = csv.reader(f)
+        next(reader, None)
 
-frame.to_csv('./part2_submission/results.csv')
+        for model_id, global_utility, depth, *action in reader:
+
+            if model_id not in models:
+                models[model_id] = (float(global_utility), int(depth), model_id, [])
+
+            models[model_id][3].append(tuple(action))
+
+    return top_models(models.values(), top_k)
+
+
+def top_models(models, top_k):
+    '''
+    best top_k models by global utility, identical transaction sequences are kept once
+    models: iterable of (global utility, depth, model id, transactions)
+    '''
+    best = {}
+
+    for model in models:
+        sequence = tuple(model[3])
+
+        if sequence not in best or best[sequence][0] < model[0]:
+            best[sequence] = model
+
+    return heapq.nlargest(top_k, best.values(), key=lambda x: x[0])
+
+
+def aggregate_runs(path='./sim_runs', output_filename='./part2_submission/results.csv', top_k=AGGREGATE_TOP_K, workers=PARALLEL_WORKERS):
+    '''
+    Merge the transaction lists of every run in path into one results file holding the top_k distinct models.
+    Files are read in parallel and reduced to their own top_k before merging, so memory stays at O(files * top_k) models.
+    :return: number of models written
+    '''
+    all_files = glob.glob(os.path.join(path, "*_transaction_list.csv"))
+
+    print(f'Aggregating {len(all_files)} files')
+
+    # min heap of the best models so far, plus the sequences it holds (and their utility) for de-duplication
+    heap = []
+    kept = {}
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+
+        for models in pool.map(read_models, all_files, [top_k] * len(all_files), chunksize=16):
+
+            for model in models:
+                sequence = tuple(model[3])
+
+                # runs with other discount settings can score the same sequence differently, keep the best copy as top_models does
+                if sequence in kept:
+                    if kept[sequence] < model[0]:
+                        n = next(n for n, entry in enumerate(heap) if entry[1] == sequence)
+                        heap[n] = (model[0], sequence, model)
+                        heapq.heapify(heap)
+                        kept[sequence] = model[0]
+
+                    continue
+
+                if len(heap) < top_k:
+                    heapq.heappush(heap, (model[0], sequence, model))
+                    kept[sequence] = model[0]
+
+                elif model[0] > heap[0][0]:
+                    del kept[heapq.heapreplace(heap, (model[0], sequence, model))[1]]
+                    kept[sequence] = model[0]
+
+    os.makedirs(os.path.dirname(output_filename) or '.', exist_ok=True)
+
+    # rows are streamed out model by model, best first, with a running row index
+    with open(output_filename, 'w', newline='') as f:
+
+        wr = csv.writer(f)
+        wr.writerow(['', 'Rank', *TRANSACTION_LOG_HEADERS])
+
+        row = 0
+
+        for rank, (_, _, (global_utility, depth, model_id, transactions)) in enumerate(sorted(heap, key=lambda x: x[0], reverse=True), start=1):
+
+            for action in transactions:
+                wr.writerow([row, rank, model_id, global_utility, depth, *action])
+                row += 1
+
+    return len(heap)
+
+
+if __name__ == '__main__':
+    aggregate_runs()
@@ -0,0 +1,62 @@
+class Search_Frontier(dict):
+    '''
+    Counts of events already performed below each node, keyed by node hex_name then event.
+    Only nodes on the active search path are kept: the search drops a node's entry when it backtracks past it.
+    max_events: cap on the number of (node, event) counts held, the entries closest to the root are evicted first once full.
+        None for no cap.
+    '''
+
+    def __init__(self, max_events=None):
+        super().__init__()
+        self.max_events = max_events
+
+        self.events = 0
+        self.peak_events = 0
+        self.dropped = 0
+        self.evicted = 0
+
+    def __repr__(self):
+        return f'{type(self).__name__}(Nodes={len(self)}, Events={self.events}, Peak Events={self.peak_events}, Dropped={self.dropped}, Evicted={self.evicted})'
+
+    def track(self, parent_node_id, event):
+
+        if parent_node_id in self:
+
+            # check if event occurred at a given parent node N
+            if event in self[parent_node_id]:
+                self[parent_node_id][event] += 1
+                return
+
+            self[parent_node_id][event] = 1
+
+        # new parent node, add it to the tracker
+        else:
+            self[parent_node_id] = { event : 1 }
+
+        self.events += 1
+        self.peak_events = max(self.peak_events, self.events)
+
+        if self.max_events is not None:
+            while self.events > self.max_events and len(self) > 1:
+                # dicts keep insertion order, the first entry is the oldest node still on the path
+                oldest = next(iter(self))
+                self.events -= len(self.pop(oldest))
+                self.evicted += 1
+
+    def restore(self, node_id, counts):
+        '''put back the counts of node_id, used when resuming from a checkpoint'''
+        if not counts:
+            return
+
+        self[node_id] = dict(counts)
+        self.events += len(counts)
+        self.peak_events = max(self.peak_events, self.events)
+
+    def drop(self, node_id):
+        '''forget events performed below node_id, called once the search backtracks past it'''
+        if node_id in self:
+            self.events -= len(self.pop(node_id))
+            self.dropped += 1
+
+    def stats(self):
+        return {'nodes': len(self), 'events': self.events, 'peak_events': self.peak_events, 'dropped': self.dropped, 'evicted': self.evicted}
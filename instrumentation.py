@@ -0,0 +1,120 @@
+import io
+import pstats
+import cProfile
+import tracemalloc
+
+from collections import defaultdict
+from time import perf_counter
+
+
+class Search_Stats(object):
+    '''
+    Per phase timers and counters of one search, shared by every node like the search random number generator.
+    Hot paths call start()/stop() around each phase, when disabled both return straight away so the cost is two method calls.
+    enabled: False to record nothing
+    '''
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = perf_counter()
+
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(Enabled={self.enabled}, Phases={len(self.times)}, Counters={dict(self.counters)})'
+
+    def start(self):
+        ''':return: start time to hand to stop(), 0 when disabled'''
+        if self.enabled:
+            return perf_counter()
+
+        return 0
+
+    def stop(self, phase, started):
+        '''add the time since started to phase and count one call'''
+        if self.enabled:
+            self.times[phase] += perf_counter() - started
+            self.calls[phase] += 1
+
+    def count(self, counter, amount=1):
+        if self.enabled:
+            self.counters[counter] += amount
+
+    def report(self, frontier=None, transpositions=None, bound=None, option_cache=None):
+        ''':return: text summary, one line per phase (slowest first) and counter'''
+        elapsed = perf_counter() - self.started
+
+        lines = [f'Search Stats, {elapsed:.3f}s wall clock',
+                 f'{"Phase":<20} {"Calls":>10} {"Total s":>10} {"Mean us":>10} {"Share":>7}']
+
+        for phase, total in sorted(self.times.items(), key=lambda x: x[1], reverse=True):
+            calls = self.calls[phase]
+            lines.append(f'{phase:<20} {calls:>10,} {total:>10.3f} {total / calls * 1e6:>10.1f} {total / elapsed:>7.1%}')
+
+        for counter, value in sorted(self.counters.items()):
+            lines.append(f'{counter:<20} {value:>10,}')
+
+        if frontier is not None:
+            lines.append(repr(frontier))
+
+        if transpositions is not None:
+            lines.append(repr(transpositions))
+
+        if bound is not None:
+            lines.append(repr(bound))
+
+        if option_cache is not None:
+            lines.append(repr(option_cache))
+
+        return '\n'.join(lines)
+
+
+def profile_call(mode, run, filename_for=None, top=25):
+    '''
+    Runs run() under a profiler and prints the top entries.
+    mode: 'cprofile' for time per function, 'tracemalloc' for memory per line
+    filename_for: function of run()'s result giving the file for the full capture (pstats dump for cprofile, text for tracemalloc),
+        None (or returning None) to only print
+    :return: what run() returned
+    '''
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        result = profiler.runcall(run)
+
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(top)
+        print(output.getvalue())
+
+        filename = None if filename_for is None else filename_for(result)
+
+        if filename is not None:
+            profiler.dump_stats(filename)
+
+        return result
+
+    elif mode == 'tracemalloc':
+        tracemalloc.start()
+
+        try:
+            result = run()
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+
+        finally:
+            tracemalloc.stop()
+
+        statistics = snapshot.statistics('lineno')
+        lines = [f'Peak traced memory {peak / 2**20:.2f} MB, largest allocations still held:', *map(str, statistics[:top])]
+        print('\n'.join(lines))
+
+        filename = None if filename_for is None else filename_for(result)
+
+        if filename is not None:
+            with open(filename, 'w') as f:
+                f.write('\n'.join(lines[:1] + list(map(str, statistics))))
+
+        return result
+
+    raise ValueError('Invalid profile mode.')
@@ -0,0 +1,47 @@
+from collections import OrderedDict
+
+
+class LRU_Table(object):
+    '''
+    Bounded key -> value table with least recently used eviction, counts hits, misses and evictions.
+    Base of the search's memo tables (Transposition_Table, Option_Cache), None values cannot be stored.
+    max_size: number of keys kept, the oldest untouched key is dropped once full
+    '''
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.table = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.table)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(Size={len(self)}/{self.max_size}, Hits={self.hits}, Misses={self.misses}, Evictions={self.evictions})'
+
+    def get(self, key):
+        '''cached value of key (and marks it recently used), None if it is not cached'''
+        value = self.table.get(key)
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.table.move_to_end(key)
+        self.hits += 1
+
+        return value
+
+    def put(self, key, value):
+
+        self.table[key] = value
+
+        if len(self.table) > self.max_size:
+            self.table.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {'size': len(self), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
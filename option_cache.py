@@ -0,0 +1,19 @@
+from lru import LRU_Table
+
+
+class Option_Cache(LRU_Table):
+    '''
+    Bounded memo of the feasible options of a country, keyed by the country and its resource vector, with least recently used
+    eviction.  Countries come back to the same resources all the time (backtracking, other countries acting, trades undone),
+    each distinct state is only worked through once (see Country.generate_country_options).
+    One cache per search, minimum_transfer and create_intervals are part of the key so a cache is never read with other settings.
+    max_size: number of country states kept, the oldest untouched one is dropped once full
+    '''
+
+    def __init__(self, max_size=10000):
+        super().__init__(max_size)
+
+    @staticmethod
+    def key(country, minimum_transfer, intervals_to_check):
+        '''key of the feasible options of country (a Country view) with the given settings'''
+        return (country.index, country.resources.tobytes(), tuple(minimum_transfer), tuple(intervals_to_check))
@@ -0,0 +1,152 @@
+from heapq import heappush, heappop
+
+
+class Option_Stream(object):
+    '''
+    Options of one node in the order they will be tried, each priced only when it is taken.
+    codes: list of action codes, already in search order (see Simulation_Node.get_options)
+    price: function of an action code giving its util at the node (Simulation_Node.price_option), only called while the world
+        is at the node.  None on a snapshot, set it again once the node is rebuilt.
+    '''
+
+    __slots__ = ('codes', 'cursor', 'price')
+
+    def __init__(self, codes, price=None):
+        self.codes = codes
+        self.cursor = 0
+        self.price = price
+
+    def __repr__(self):
+        return f'{type(self).__name__}(Options={len(self.codes)}, Remaining={len(self)})'
+
+    def __len__(self):
+        return len(self.codes) - self.cursor
+
+    def pop(self):
+        '''(action code, util) of the next option in search order, raises IndexError once every option has been taken'''
+        if self.cursor == len(self.codes):
+            raise IndexError('pop from empty Option_Stream')
+
+        code = self.codes[self.cursor]
+        self.cursor += 1
+
+        return (code, self.price(code))
+
+    def snapshot(self):
+        '''unpriced copy at the current cursor, see Search_Checkpoint'''
+        return Option_Stream(self.codes[self.cursor:])
+
+
+class Utility_Stream(object):
+    '''
+    Options of one node in utility order, priced only when they reach the front.
+    The options are split into groups whose utility order is known without pricing (see Simulation_Node.utility_stream),
+    the stream merges the groups on the exact util of each group's next options.  Options of a group with the same util sit
+    next to each other but not in index order, so each group puts its whole run of equal utils on the heap at once (pricing one
+    option past the run) and the heap orders them by index.
+    Ties go to the lower index, the same order as a stable sort of every priced option.
+    groups: lists of (index, action code), each in utility order
+    price: see Option_Stream
+    descending: highest util first (utility_first), False for lowest first (utility_last)
+    '''
+
+    __slots__ = ('groups', 'cursors', 'ahead', 'queued', 'heap', 'left', 'price', 'descending')
+
+    def __init__(self, groups, price=None, descending=True):
+        self.groups = groups
+        self.cursors = [0] * len(groups)
+        self.ahead = [None] * len(groups)
+        self.queued = [0] * len(groups)
+        self.heap = None
+        self.left = sum(len(group) for group in groups)
+        self.price = price
+        self.descending = descending
+
+    def __repr__(self):
+        return f'{type(self).__name__}(Groups={len(self.groups)}, Remaining={len(self)})'
+
+    def __len__(self):
+        return self.left
+
+    def push(self, group):
+        '''price the next run of equal utils of group onto the heap, the util of the option after the run is kept in ahead'''
+        options = self.groups[group]
+        cursor = self.cursors[group]
+
+        if cursor == len(options):
+            return
+
+        util = self.ahead[group]
+
+        if util is None:
+            util = self.price(options[cursor][1])
+
+        key = -util if self.descending else util
+        queued = 0
+
+        while True:
+            index, code = options[cursor]
+            heappush(self.heap, (key, index, code, group))
+            queued += 1
+            cursor += 1
+
+            if cursor == len(options):
+                self.ahead[group] = None
+                break
+
+            following = self.price(options[cursor][1])
+
+            if following != util:
+                self.ahead[group] = following
+                break
+
+        self.cursors[group] = cursor
+        self.queued[group] = queued
+
+    def pop(self):
+        '''(action code, util) of the next option in utility order, raises IndexError once every option has been taken'''
+        if self.left == 0:
+            raise IndexError('pop from empty Utility_Stream')
+
+        if self.heap is None:
+            self.heap = []
+
+            for group in range(len(self.groups)):
+                self.push(group)
+
+        key, _, code, group = heappop(self.heap)
+        self.left -= 1
+        self.queued[group] -= 1
+
+        if self.queued[group] == 0:
+            self.push(group)
+
+        return (code, -key if self.descending else key)
+
+    def snapshot(self):
+        '''copy without price, see Search_Checkpoint.  Options already priced keep their util, the world is the same on resume.'''
+        stream = Utility_Stream(self.groups, descending=self.descending)
+        stream.cursors = list(self.cursors)
+        stream.ahead = list(self.ahead)
+        stream.queued = list(self.queued)
+        stream.heap = None if self.heap is None else list(self.heap)
+        stream.left = self.left
+
+        return stream
+
+
+def drop_random(options, count, rng):
+    '''
+    options with count of them removed at random, the rest keep their order.
+    Samples whichever side is smaller (removed or kept positions) then makes one pass, the same outcome distribution as popping
+    count random positions one by one.
+    rng: random.Random of the search
+    '''
+    keep = len(options) - count
+
+    if keep < count:
+        return [options[n] for n in sorted(rng.sample(range(len(options)), keep))]
+
+    removed = set(rng.sample(range(len(options)), count))
+
+    return [option for n, option in enumerate(options) if n not in removed]
@@ -1,24 +1,77 @@
 import os
-import sys
-import inspect
+import csv
+import secrets
 
-from subprocess import run
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 
-def get_script_dir(follow_symlinks=True):
-    # https://stackoverflow.com/questions/3718657/how-do-you-properly-determine-the-current-script-directory/22881871#22881871
+from search import Search_Config, run_search
+from tradesim import load_world
+from config.simulation_configuration import (
+    TOTAL_RUNS,
+    PARALLEL_WORKERS,
+    BASE_SEED,
+    LEADERBOARD_SIZE,
+    total_counter,
+    )
 
-    if getattr(sys, 'frozen', False): # py2exe, PyInstaller, cx_Freeze
-        path = os.path.abspath(sys.executable)
-    else:
-        path = inspect.getabsfile(get_script_dir)
-    if follow_symlinks:
-        path = os.path.realpath(path)
-    return os.path.dirname(path)
+# read only initial state, set once per worker process by init_worker
+initial_world = None
 
-#https://stackoverflow.com/questions/30076185/calling-a-python-script-with-input-within-a-python-script-using-subprocess
-script_path = os.path.join(get_script_dir(), 'tradesim.py')
 
-for x in range(0, 25):
-    output = run([sys.executable, script_path],
-                        input='\n'.join(['query 1', 'query 2']),
-                        universal_newlines=True)
\ No newline at end of file
+def init_worker(world_state):
+    global initial_world
+    initial_world = world_state
+
+
+def run_one(run_id, seed, steps=total_counter):
+    '''
+    Run a single randomized search in a worker process.
+    :return: Tuple (run_id, seed, global utility, depth, transaction list) for the best node of the run
+    '''
+    config = Search_Config(total_counter=steps, run_label=f'run{run_id:03d}', show_progress=False, new_best_score_alert=False, seed=seed)
+    result = run_search(config, initial_world)
+
+    return (run_id, seed, result.global_utility, result.best_node.depth, result.transactions())
+
+
+def run_many(total_runs=TOTAL_RUNS, workers=PARALLEL_WORKERS, base_seed=BASE_SEED, steps=total_counter, leaderboard_size=LEADERBOARD_SIZE):
+    '''
+    Runs total_runs independent searches across a process pool and merges their best nodes into one leaderboard.
+    Run n is seeded with base_seed + n so any run can be repeated on its own.
+    :return: list of run results, best global utility first
+    '''
+    if base_seed is None:
+        base_seed = secrets.randbelow(2**31)
+
+    world_state = load_world()
+    results = []
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(world_state,)) as pool:
+
+        futures = [pool.submit(run_one, run_id, base_seed + run_id, steps) for run_id in range(total_runs)]
+
+        for future in as_completed(futures):
+            result = future.result()
+            print(f'Run {result[0]} (seed {result[1]}) finished, best score {result[2:4]}')
+            results.append(result)
+
+    leaderboard = sorted(results, key=lambda x: x[2], reverse=True)[:leaderboard_size]
+
+    saved_timestamp = datetime.now().strftime("%Y-%m-%d %H_%M_%S")
+    leaderboard_filename = os.path.join('./sim_runs', f'{saved_timestamp}_leaderboard.csv')
+
+    with open(leaderboard_filename, 'w') as f:
+
+        wr = csv.writer(f)
+        wr.writerow(['Rank', 'Run', 'Seed', 'Global_Utility', 'Depth', 'Action_Type', 'Actor', 'Target', 'Action', 'Quantity'])
+
+        for rank, (run_id, seed, global_utility, depth, transactions) in enumerate(leaderboard, start=1):
+            for row in transactions:
+                wr.writerow([rank, run_id, seed, global_utility, depth, *row])
+
+    return leaderboard
+
+
+if __name__ == '__main__':
+    run_many()
@@ -0,0 +1,808 @@
+import os
+import secrets
+
+from datetime import datetime
+from heapq import heappush, heappop
+from itertools import count
+from math import log, sqrt
+from random import Random
+from action import check_quantity
+from bound import Utility_Bound
+from budget import Search_Budget
+from checkpoint import Search_Checkpoint
+from search_log import Search_Log
+from frontier import Search_Frontier
+from instrumentation import Search_Stats, profile_call
+from simulation_node import Simulation_Node
+from transposition import Transposition_Table
+from option_cache import Option_Cache
+from util import get_turn_tracker
+from config.simulation_configuration import (
+    MINIMUM_TRANSFER,
+    CREATE_INTERVALS,
+    SORT_STRATEGY,
+    MAX_DEPTH,
+    MAX_REPEATS,
+    TRANSPOSITION_TABLE_SIZE,
+    OPTION_CACHE_SIZE,
+    BRANCH_AND_BOUND,
+    FRONTIER_MAX_EVENTS,
+    SEARCH_ENGINE,
+    BEAM_WIDTH,
+    MCTS_EXPLORATION,
+    TIME_LIMIT,
+    MEMORY_LIMIT_MB,
+    BUDGET_CHECK_INTERVAL,
+    CHECKPOINT_INTERVAL,
+    LOG_BUFFER_SIZE,
+    SEED,
+    INSTRUMENT,
+    PROFILE,
+    countries,
+    total_counter,
+    )
+
+from tqdm import tqdm # for progress bar
+
+
+class Search_Config(object):
+    '''
+    Settings for one search.  Defaults come from config/simulation_configuration.py, override any of them per call.
+    output_dir: folder for the transaction list, metadata and node log files, None to skip writing files
+    run_label: added to output file names, keeps runs started in the same second apart
+    transposition_table_size: explored states remembered to skip duplicates reached by a different action order, 0 to disable
+    option_cache_size: country resource states whose feasible options are remembered (see option_cache.Option_Cache), 0 to disable
+    frontier_max_events: cap on repeat counts held by the frontier, None for no cap
+    search_engine: 'dfs', 'beam', 'best_first' or 'mcts', see SEARCH_ENGINES
+    beam_width: nodes kept per depth by the beam engine
+    mcts_exploration: UCT exploration constant of the mcts engine
+    time_limit: wall clock budget in seconds, None for no limit
+    memory_limit_mb: stop once the process memory reaches this many MB, None for no limit
+    budget_check_interval: steps between reads of the clock and memory
+    checkpoint_interval: steps between checkpoint files (dfs engine, needs output_dir), None to only checkpoint when the search stops
+    log_buffer_size: steps held in memory before they are handed to the log writer thread
+    seed: seed of the one random.Random used by the search, None to draw one.  The seed used is in Search_Result.seed and the metadata file.
+    instrument: time each phase of the search and count copies (see instrumentation.Search_Stats), printed and saved when the search ends
+    profile: None, 'cprofile' or 'tracemalloc' to run the whole search under that profiler
+    branch_and_bound: dfs engine skips subtrees whose optimistic utility bound cannot beat the best node (see bound.Utility_Bound)
+    '''
+
+    def __init__(self, minimum_transfer=MINIMUM_TRANSFER, create_intervals=CREATE_INTERVALS, sort_strategy=SORT_STRATEGY,
+                 max_depth=MAX_DEPTH, max_repeats=MAX_REPEATS, countries=countries, total_counter=total_counter,
+                 output_dir='./sim_runs', run_label=None, show_progress=True, new_best_score_alert=True,
+                 transposition_table_size=TRANSPOSITION_TABLE_SIZE, option_cache_size=OPTION_CACHE_SIZE, frontier_max_events=FRONTIER_MAX_EVENTS,
+                 search_engine=SEARCH_ENGINE, beam_width=BEAM_WIDTH, mcts_exploration=MCTS_EXPLORATION, time_limit=TIME_LIMIT,
+                 memory_limit_mb=MEMORY_LIMIT_MB, budget_check_interval=BUDGET_CHECK_INTERVAL, checkpoint_interval=CHECKPOINT_INTERVAL,
+                 log_buffer_size=LOG_BUFFER_SIZE, seed=SEED, instrument=INSTRUMENT,
+                 profile=PROFILE, branch_and_bound=BRANCH_AND_BOUND):
+
+        # option generation packs these straight into action codes (see Country.feasible_options), check them once here
+        for quantity in (*minimum_transfer, *create_intervals):
+            check_quantity(quantity)
+
+        self.minimum_transfer = minimum_transfer
+        self.create_intervals = create_intervals
+        self.sort_strategy = sort_strategy
+        self.max_depth = max_depth
+        self.max_repeats = max_repeats
+        self.countries = countries
+        self.total_counter = total_counter
+        self.output_dir = output_dir
+        self.run_label = run_label
+        self.show_progress = show_progress
+        self.new_best_score_alert = new_best_score_alert
+        self.transposition_table_size = transposition_table_size
+        self.option_cache_size = option_cache_size
+        self.frontier_max_events = frontier_max_events
+        self.search_engine = search_engine
+        self.beam_width = beam_width
+        self.mcts_exploration = mcts_exploration
+        self.time_limit = time_limit
+        self.memory_limit_mb = memory_limit_mb
+        self.budget_check_interval = budget_check_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.log_buffer_size = log_buffer_size
+        self.seed = seed
+        self.instrument = instrument
+        self.branch_and_bound = branch_and_bound
+        self.profile = profile
+
+    def __repr__(self):
+        return f'{type(self).__name__}({", ".join(f"{k}={v!r}" for k, v in vars(self).items())})'
+
+
+class Search_Result(object):
+    '''
+    Outcome of one anytime search.
+    best_node: Simulation_Node with the highest global utility found, its world is the (changed) search world, see best_world
+    best_world: World_State snapshot taken when best_node was found
+    best_actions: list of (global utility, depth, node) tuples, one per improvement, in the order they were found
+    node_log: file with the global utility, depth and count remaining of every step (see search_log.read_node_log), None without output_dir
+    initial_utility: global utility of the initial world
+    steps: number of steps taken
+    transpositions: Transposition_Table used by the search, None if disabled
+    option_cache: Option_Cache used by the search, None if disabled
+    frontier: Search_Frontier at the end of the search, see its stats().  None for engines without one.
+    bound: Utility_Bound of the search with its check and prune counts, None if branch and bound was off or the engine does not use it
+    stop_reason: 'steps' (total_counter used up), 'time', 'memory' or 'complete' (nothing left to explore)
+    checkpoint: Search_Checkpoint of the current path and frontier when the search stopped
+    seed: seed of the search random number generator, rerun with Search_Config(seed=seed) to repeat the search
+    stats: Search_Stats of the search, only filled in when Search_Config.instrument is set
+    saved_timestamp: prefix of the output files, None without output_dir
+    '''
+
+    def __init__(self, best_node, best_world, best_actions, node_log, initial_utility, steps, transpositions=None, frontier=None, bound=None,
+                 stop_reason=None, checkpoint=None, seed=None, stats=None, saved_timestamp=None, option_cache=None):
+        self.best_node = best_node
+        self.best_world = best_world
+        self.best_actions = best_actions
+        self.node_log = node_log
+        self.initial_utility = initial_utility
+        self.steps = steps
+        self.transpositions = transpositions
+        self.option_cache = option_cache
+        self.frontier = frontier
+        self.bound = bound
+        self.stop_reason = stop_reason
+        self.checkpoint = checkpoint
+        self.seed = seed
+        self.stats = stats
+        self.saved_timestamp = saved_timestamp
+
+    def __repr__(self):
+        return f'''
+        {type(self).__name__}(
+            Global Utility={self.best_node.global_utility}
+            Depth={self.best_node.depth}
+            Steps={self.steps}
+            Stop Reason={self.stop_reason}
+            Seed={self.seed}
+            )
+            '''
+
+    @property
+    def global_utility(self):
+        return self.best_node.global_utility
+
+    def transactions(self):
+        '''actions from the initial world to the best node'''
+        return self.best_node.extract_transaction_sequence()
+
+
+class Search_Recorder(object):
+    '''
+    Anytime bookkeeping shared by every search engine: best node so far, per step utility log and output files.
+    config: Search_Config
+    initial_utility: global utility of the initial world, reported in the metadata file
+    seed: seed of the search random number generator, reported in the metadata file
+    stats: Search_Stats shared with the nodes of the search
+    checkpoint: Search_Checkpoint when resuming, continues its step count and output files
+    '''
+
+    def __init__(self, config, initial_utility, seed=None, stats=None, checkpoint=None):
+        self.config = config
+        self.initial_utility = initial_utility
+        self.seed = seed
+        self.stats = Search_Stats() if stats is None else stats
+
+        self.best_node = None
+        self.best_world = None
+        self.best_actions = []
+        self.steps = 0 if checkpoint is None else checkpoint.steps
+        self.step_offset = self.steps
+
+        self.budget = Search_Budget(config.time_limit, config.memory_limit_mb, config.budget_check_interval)
+        self.pbar = tqdm(total=config.total_counter, disable=not config.show_progress)
+
+        self.saved_timestamp = None
+
+        if checkpoint is not None and checkpoint.saved_timestamp is not None and config.output_dir is not None:
+            # keep appending to the files of the interrupted search
+            self.saved_timestamp = checkpoint.saved_timestamp
+
+        elif config.output_dir is not None:
+            saved_timestamp = datetime.now().strftime("%Y-%m-%d %H_%M_%S")
+
+            if config.run_label:
+                saved_timestamp = f'{saved_timestamp}_{config.run_label}'
+
+            self.saved_timestamp = saved_timestamp
+
+        prefix = None if self.saved_timestamp is None else os.path.join(config.output_dir, self.saved_timestamp)
+        self.log = Search_Log(prefix, buffer_size=config.log_buffer_size, start_step=self.steps,
+                              transaction_offset=None if checkpoint is None else checkpoint.transaction_offset)
+
+    def step(self, node, count_remaining):
+        '''log one step of the search at node'''
+        self.steps += 1
+
+        self.log.step(node.global_utility, node.depth, count_remaining)
+
+        if count_remaining % 10 == 0:
+            self.pbar.update(10)
+
+    def set_best(self, node):
+        '''make node the best node without logging it as an improvement'''
+        # the node keeps its utility and path, its world may be shared with the search so snapshot it
+        self.best_node = node
+        self.best_world = node.world.copy()
+        self.stats.count('copied_bytes', self.best_world.nbytes())
+
+    def offer(self, node):
+        '''keep node if it beats the best node so far'''
+
+        # need to return these for anytime search
+        if self.best_node is not None and self.best_node.global_utility >= node.global_utility:
+            return False
+
+        self.set_best(node)
+
+        best_node_data = (node.global_utility, node.depth, node)
+
+        if self.config.new_best_score_alert:
+            print(f'New best score! {best_node_data[:2]}')
+
+        self.best_actions.append(best_node_data)
+
+        if self.config.output_dir is not None:
+            started = self.stats.start()
+            self.log.best(node.model_id(salt=self.steps), node.global_utility, node.depth, node.extract_transaction_sequence(),
+                          best_node_metadata(self.config, node, self.initial_utility, self.seed))
+            self.stats.stop('log_best', started)
+
+        return True
+
+    def checkpoint_filename(self):
+        '''checkpoint file of this search, None if checkpoints are not written'''
+        if self.saved_timestamp is None:
+            return None
+
+        return os.path.join(self.config.output_dir, f'{self.saved_timestamp}_checkpoint.pkl')
+
+    def save_checkpoint(self, current_node, frontier=None, transpositions=None, stop_reason=None):
+        '''write a Search_Checkpoint of the search if output files are enabled, returns the checkpoint'''
+        started = self.stats.start()
+
+        # the node log and transaction list on disk must reach the checkpoint, a resume truncates them there
+        transaction_offset = self.log.transaction_offset()
+
+        checkpoint = Search_Checkpoint.from_search(current_node or self.best_node, frontier, self.best_node, self.steps, stop_reason=stop_reason,
+                                                   transpositions=transpositions, saved_timestamp=self.saved_timestamp, seed=self.seed,
+                                                   transaction_offset=transaction_offset)
+
+        if self.checkpoint_filename() is not None:
+            checkpoint.save(self.checkpoint_filename())
+
+        self.stats.stop('checkpoint', started)
+
+        return checkpoint
+
+    def checkpoint_due(self):
+        interval = self.config.checkpoint_interval
+
+        return interval is not None and self.steps > self.step_offset and self.steps % interval == 0
+
+    def result(self, current_node=None, total_counter=0, transpositions=None, frontier=None, bound=None):
+        '''
+        close the progress bar, write the node log and return the Search_Result
+        current_node: node the search stopped at, used for the checkpoint
+        total_counter: steps left when the search stopped
+        '''
+        self.pbar.close()
+
+        if self.budget.stop_reason is not None:
+            stop_reason = self.budget.stop_reason
+
+        elif total_counter <= 0:
+            stop_reason = 'steps'
+
+        else:
+            stop_reason = 'complete'
+
+        if self.config.checkpoint_interval is not None:
+            checkpoint = self.save_checkpoint(current_node, frontier=frontier, transpositions=transpositions, stop_reason=stop_reason)
+
+        else:
+            checkpoint = Search_Checkpoint.from_search(current_node or self.best_node, frontier, self.best_node, self.steps, stop_reason=stop_reason,
+                                                       transpositions=transpositions, saved_timestamp=self.saved_timestamp, seed=self.seed,
+                                                       transaction_offset=self.log.transaction_offset())
+
+        # export log of global utility changes for graphing
+        started = self.stats.start()
+        self.log.close()
+        self.stats.stop('log_close', started)
+
+        option_cache = (current_node or self.best_node).option_cache
+
+        if self.stats.enabled:
+            report = self.stats.report(frontier=frontier, transpositions=transpositions, bound=bound, option_cache=option_cache)
+            print(report)
+
+            if self.saved_timestamp is not None:
+                with open(os.path.join(self.config.output_dir, f'{self.saved_timestamp}_search_stats.txt'), 'w') as f:
+                    f.write(report)
+
+        return Search_Result(self.best_node, self.best_world, self.best_actions, getattr(self.log, 'node_log_filename', None), self.initial_utility,
+                             steps=self.steps, transpositions=transpositions, frontier=frontier, bound=bound,
+                             stop_reason=stop_reason, checkpoint=checkpoint, seed=self.seed, stats=self.stats,
+                             saved_timestamp=self.saved_timestamp, option_cache=option_cache)
+
+
+def make_rng(config):
+    '''
+    seed and random.Random of one search, every random choice of the search comes from it
+    :return: Tuple (seed, random.Random), the seed is drawn when config.seed is None
+    '''
+    seed = secrets.randbelow(2**32) if config.seed is None else config.seed
+
+    return seed, Random(seed)
+
+
+def make_root(config, initial_world, rng=None, stats=None):
+    '''
+    root node of a search, works on its own copy of initial_world
+    rng: random.Random of the search, see make_rng
+    stats: Search_Stats shared by the nodes of the search, None for a new one following config.instrument
+    '''
+    turn_tracker_input = get_turn_tracker(config.max_depth, config.countries)
+
+    if stats is None:
+        stats = Search_Stats(enabled=config.instrument)
+
+    option_cache = Option_Cache(max_size=config.option_cache_size) if config.option_cache_size else None
+
+    first_node = Simulation_Node(initial_world.copy(), turn_tracker=turn_tracker_input, rng=rng, stats=stats, option_cache=option_cache)
+    first_node.update_global_expected_utiliziation()
+
+    return first_node
+
+
+def make_transposition_table(config, first_node):
+
+    if not config.transposition_table_size:
+        return None
+
+    transpositions = Transposition_Table(max_size=config.transposition_table_size)
+    transpositions.seen(first_node.state_key())
+
+    return transpositions
+
+
+def make_bound(config, initial_world, node):
+    '''Utility_Bound of a search from initial_world (not a world part way down the search, its totals could be lower), None if disabled'''
+    if not config.branch_and_bound:
+        return None
+
+    return Utility_Bound(initial_world, node.turn_tracker, config.max_depth, node.get_discount_rate, config.minimum_transfer,
+                         config.create_intervals)
+
+
+def replay_path(config, initial_world, path, frontier_counts=None, frontier=None, rng=None, stats=None, option_streams=None):
+    '''
+    Rebuilds the node chain for path (list of action tuples, see extract_transaction_sequence) from a fresh root, in place on one copy of initial_world.
+    frontier_counts/frontier: counts per path node from a Search_Checkpoint, restored into frontier under the new node names
+    option_streams: options left at each path node from a Search_Checkpoint, given back to the rebuilt nodes
+    :return: last node of the path
+    '''
+    node = make_root(config, initial_world, rng, stats)
+
+    if frontier_counts is not None:
+        frontier.restore('top_level_node', frontier_counts[0])
+
+    for n, action in enumerate(path):
+
+        if frontier_counts is not None:
+            frontier.restore(node.hex_name, frontier_counts[n + 1])
+
+        restore_options(node, option_streams, n)
+        node = node.advance(initial_world.tables.encode_action(action))
+
+    if frontier_counts is not None:
+        frontier.restore(node.hex_name, frontier_counts[len(path) + 1])
+
+    restore_options(node, option_streams, len(path))
+
+    return node
+
+
+def restore_options(node, option_streams, n):
+    '''hand the n-th saved option stream of a Search_Checkpoint to node, priced at node from here on'''
+    if option_streams is None or option_streams[n] is None:
+        return
+
+    stream = option_streams[n].snapshot()
+    stream.price = node.price_option
+    node.possible_actions[node.country_acting] = stream
+
+
+def depth_first_search(config, initial_world, checkpoint=None):
+    '''
+    Depth first anytime search, options at each node are ordered by config.sort_strategy.
+    The search world is shared by every node on the current path and rolled back on backtrack.
+    checkpoint: Search_Checkpoint to continue from, see resume_search
+    '''
+    frontier = Search_Frontier(max_events=config.frontier_max_events)
+
+    verbose = False
+
+    if checkpoint is None:
+        # only interact with the model from here on out
+        seed, rng = make_rng(config)
+        first_node = make_root(config, initial_world, rng)
+        recorder = Search_Recorder(config, first_node.global_utility, seed=seed, stats=first_node.stats)
+        transpositions = make_transposition_table(config, first_node)
+
+        _ = first_node.get_options(minimum_transfer=config.minimum_transfer,
+                                intervals_to_check=config.create_intervals,
+                                sort_method=config.sort_strategy,
+                                frontier=frontier,
+                                max_repeats=config.max_repeats)
+
+        # Take first step in the model
+
+        next_node, frontier = first_node.next_node_state(frontier, transpositions=transpositions)
+
+        # the root has no options, it is the only node and the search is complete
+        if next_node is None:
+            recorder.set_best(first_node)
+
+            return recorder.result(current_node=first_node, total_counter=config.total_counter, transpositions=transpositions,
+                                   frontier=frontier)
+
+        __ = next_node.get_options(minimum_transfer=config.minimum_transfer,
+                                intervals_to_check=config.create_intervals,
+                                frontier=frontier,
+                                sort_method=config.sort_strategy,
+                                max_repeats=config.max_repeats)
+
+        recorder.set_best(next_node)
+
+        total_counter = config.total_counter
+
+    else:
+        # rebuild the current path, frontier, transpositions and random state exactly as they were
+        rng = Random()
+        stats = Search_Stats(enabled=config.instrument)
+        recorder = Search_Recorder(config, make_root(config, initial_world).global_utility, seed=checkpoint.seed, stats=stats,
+                                   checkpoint=checkpoint)
+        next_node = replay_path(config, initial_world, checkpoint.path, checkpoint.frontier_counts, frontier, rng=rng, stats=stats,
+                                option_streams=checkpoint.option_streams)
+        recorder.set_best(replay_path(config, initial_world, checkpoint.best_path, rng=rng, stats=stats))
+
+        transpositions = None
+
+        if checkpoint.transposition_state is not None and config.transposition_table_size:
+            transpositions = Transposition_Table.from_state(checkpoint.transposition_state, max_size=config.transposition_table_size)
+
+        # replaying drew node names from rng, put it back where the interrupted search left it
+        rng.setstate(checkpoint.rng_state)
+
+        total_counter = config.total_counter - checkpoint.steps
+
+    bound = make_bound(config, initial_world, next_node)
+
+    # Enter simulation sequence
+
+    while total_counter > 0:
+
+        if recorder.checkpoint_due():
+            recorder.save_checkpoint(next_node, frontier=frontier, transpositions=transpositions)
+
+        # out of time or memory, return the best node so far
+        if recorder.budget.exhausted():
+            break
+
+        total_counter = total_counter - 1
+
+        recorder.step(next_node, total_counter)
+
+        if next_node is None:     # Back at root note with nowhere else to go, exit.
+            break
+
+        elif next_node.depth == config.max_depth: # reached depth limit, proceed to prev node
+            frontier.drop(next_node.hex_name)
+            next_node = next_node.prev_node_state(verbose=verbose)
+
+        elif bound is not None and bound.prune(next_node, recorder.best_node.global_utility):
+            # nothing below can beat the best node, treat it like the depth limit
+            frontier.drop(next_node.hex_name)
+            next_node = next_node.prev_node_state(verbose=verbose)
+
+        else:
+            # options are generated on the first visit only, coming back up from a child carries on with the same stream
+            if next_node.country_acting not in next_node.possible_actions:
+                __ = next_node.get_options(
+                    minimum_transfer=config.minimum_transfer,
+                    intervals_to_check=config.create_intervals,
+                    frontier=frontier,
+                    sort_method=config.sort_strategy,
+                    max_repeats=config.max_depth
+                    )
+
+            child_node = None
+
+            # proceed with selecting an action, advance down decision tree
+            if len(next_node.possible_actions[ next_node.country_acting ]) > 0:
+                child_node, frontier = next_node.next_node_state(frontier, verbose=verbose, transpositions=transpositions)
+
+            # no actions for this player at this node (or only actions leading to explored states)
+            if child_node is None:
+
+                # back at root node and out of options, end!
+                if next_node.depth == 1:
+                    break
+
+                # this node is never revisited, events below it no longer matter
+                frontier.drop(next_node.hex_name)
+                next_node = next_node.prev_node_state(verbose=verbose)
+
+            else:
+                next_node = child_node
+
+                # only eval "best node" for new nodes, if we are backing out no need to check!
+                if next_node.depth > 1:
+                    recorder.offer(next_node)
+
+    return recorder.result(current_node=next_node, total_counter=total_counter, transpositions=transpositions, frontier=frontier,
+                           bound=bound)
+
+
+def beam_search(config, initial_world):
+    '''
+    Level by level search keeping the config.beam_width children with the highest global utility at each depth.
+    Children are ranked from their priced options before any world is copied, only the kept ones are built.
+    Each child built is one step.
+    '''
+    seed, rng = make_rng(config)
+    first_node = make_root(config, initial_world, rng)
+    recorder = Search_Recorder(config, first_node.global_utility, seed=seed, stats=first_node.stats)
+    transpositions = make_transposition_table(config, first_node)
+
+    recorder.set_best(first_node)
+
+    total_counter = config.total_counter
+    beam = [first_node]
+
+    while beam and total_counter > 0 and beam[0].depth < config.max_depth and not recorder.budget.exhausted():
+
+        candidates = []
+
+        for node in beam:
+            for option in node.priced_options(config.minimum_transfer, config.create_intervals):
+                candidates.append((node.expected_global_utility(option), node, option))
+
+        candidates.sort(key=lambda x: x[0], reverse=True)
+
+        next_beam = []
+
+        for _, node, option in candidates:
+
+            if len(next_beam) == config.beam_width or total_counter == 0 or recorder.budget.exhausted():
+                break
+
+            child_node = node.branch(option[0])
+
+            if transpositions is not None and transpositions.seen(child_node.state_key()):
+                continue
+
+            total_counter = total_counter - 1
+            recorder.step(child_node, total_counter)
+            recorder.offer(child_node)
+
+            next_beam.append(child_node)
+
+        beam = next_beam
+
+    return recorder.result(current_node=beam[0] if beam else None, total_counter=total_counter, transpositions=transpositions)
+
+
+def best_first_search(config, initial_world):
+    '''
+    Expands the most promising known child first: a priority queue of (node, option) pairs keyed on the expected
+    global utility of the child times its discount rate (see Simulation_Node.get_discount_rate).
+    Children are only built (world copied) when popped, each child built is one step.
+    '''
+    seed, rng = make_rng(config)
+    first_node = make_root(config, initial_world, rng)
+    recorder = Search_Recorder(config, first_node.global_utility, seed=seed, stats=first_node.stats)
+    transpositions = make_transposition_table(config, first_node)
+
+    recorder.set_best(first_node)
+
+    total_counter = config.total_counter
+    queue = []
+    tie_breaker = count()
+
+    def push_options(node):
+        if node.depth == config.max_depth:
+            return
+
+        # the child sits one level deeper, discount it at that level
+        discount = node.get_discount_rate(depth=node.depth + 1)
+
+        for option in node.priced_options(config.minimum_transfer, config.create_intervals):
+            heappush(queue, (-node.expected_global_utility(option) * discount, next(tie_breaker), node, option))
+
+    push_options(first_node)
+
+    child_node = None
+
+    while queue and total_counter > 0 and not recorder.budget.exhausted():
+
+        _, _, node, option = heappop(queue)
+        child_node = node.branch(option[0])
+
+        if transpositions is not None and transpositions.seen(child_node.state_key()):
+            continue
+
+        total_counter = total_counter - 1
+        recorder.step(child_node, total_counter)
+        recorder.offer(child_node)
+
+        push_options(child_node)
+
+    return recorder.result(current_node=child_node, total_counter=total_counter, transpositions=transpositions)
+
+
+class MCTS_Tree_Node(object):
+    '''
+    Visit/value statistics for one state in the Monte Carlo search tree.
+    node: Simulation_Node with its own copy of the world
+    untried: options not expanded yet, filled on the first visit
+    '''
+
+    def __init__(self, node, parent=None):
+        self.node = node
+        self.parent = parent
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.value = 0.0
+
+    def uct_child(self, exploration, low, high):
+        '''child with the best upper confidence bound, mean values are scaled to [0, 1] using the rewards seen so far'''
+        log_visits = log(self.visits)
+        span = (high - low) or 1
+
+        return max(self.children, key=lambda c: (c.value / c.visits - low) / span + exploration * sqrt(log_visits / c.visits))
+
+
+def rollout(node, config, recorder):
+    '''
+    Cheap playout from node to max depth: a random available action at each level, applied in place on one scratch world.
+    :return: highest global utility seen on the way down
+    '''
+    best_utility = node.global_utility
+
+    if node.depth == config.max_depth:
+        return best_utility
+
+    # branch once for a scratch copy of the world, advance in place from there
+    current = None
+
+    while (current or node).depth < config.max_depth:
+
+        options = (current or node).available_options(config.minimum_transfer, config.create_intervals)
+
+        if len(options) == 0:
+            break
+
+        current = node.branch(node.rng.choice(options)) if current is None else current.advance(node.rng.choice(options))
+
+        recorder.offer(current)
+        best_utility = max(best_utility, current.global_utility)
+
+    return best_utility
+
+
+def monte_carlo_tree_search(config, initial_world):
+    '''
+    Monte Carlo Tree Search: UCT selection, one expansion per iteration, random rollout to max depth, backpropagation of the
+    best utility reached.  Each iteration is one step, stops at config.total_counter iterations or when the budget runs out.
+    '''
+    seed, rng = make_rng(config)
+    first_node = make_root(config, initial_world, rng)
+    recorder = Search_Recorder(config, first_node.global_utility, seed=seed, stats=first_node.stats)
+
+    recorder.set_best(first_node)
+
+    root = MCTS_Tree_Node(first_node)
+    low, high = float('inf'), float('-inf')
+
+    total_counter = config.total_counter
+
+    while total_counter > 0 and not recorder.budget.exhausted():
+
+        total_counter = total_counter - 1
+
+        # selection, descend while every option of a node has been tried
+        tree_node = root
+
+        while tree_node.untried == [] and tree_node.children:
+            tree_node = tree_node.uct_child(config.mcts_exploration, low, high)
+
+        # expansion
+        if tree_node.untried is None:
+            tree_node.untried = [] if tree_node.node.depth == config.max_depth else tree_node.node.available_options(config.minimum_transfer, config.create_intervals)
+
+        if tree_node.untried:
+            option = tree_node.untried.pop(rng.randrange(len(tree_node.untried)))
+            child = MCTS_Tree_Node(tree_node.node.branch(option), parent=tree_node)
+            tree_node.children.append(child)
+            tree_node = child
+
+            recorder.offer(tree_node.node)
+
+        recorder.step(tree_node.node, total_counter)
+
+        # simulation
+        reward = rollout(tree_node.node, config, recorder)
+        low, high = min(low, reward), max(high, reward)
+
+        # backpropagation
+        while tree_node is not None:
+            tree_node.visits += 1
+            tree_node.value += reward
+            tree_node = tree_node.parent
+
+    return recorder.result(current_node=recorder.best_node, total_counter=total_counter)
+
+
+# valid values for Search_Config.search_engine
+SEARCH_ENGINES = {
+    'dfs': depth_first_search,
+    'beam': beam_search,
+    'best_first': best_first_search,
+    'mcts': monte_carlo_tree_search,
+    }
+
+
+def run_search(config, initial_world):
+    '''
+    Runs one anytime search from initial_world.  Can be called repeatedly in one process, nothing is read from disk.
+    config: Search_Config, config.search_engine picks the engine from SEARCH_ENGINES
+    initial_world: World_State, not changed by the search
+    :return: Search_Result
+    '''
+    if config.search_engine not in SEARCH_ENGINES:
+        raise ValueError('Invalid search engine.')
+
+    if config.profile is not None:
+        return profile_call(config.profile, lambda: SEARCH_ENGINES[config.search_engine](config, initial_world),
+                            filename_for=lambda result: profile_filename(config, result))
+
+    return SEARCH_ENGINES[config.search_engine](config, initial_world)
+
+
+def profile_filename(config, result):
+    '''where run_search saves a profiler capture, next to the other output files of the search'''
+    if result.saved_timestamp is None:
+        return None
+
+    extension = 'prof' if config.profile == 'cprofile' else 'txt'
+
+    return os.path.join(config.output_dir, f'{result.saved_timestamp}_{config.profile}.{extension}')
+
+
+def resume_search(config, initial_world, checkpoint):
+    '''
+    Continues a depth first search from a Search_Checkpoint (see Search_Checkpoint.load).  With the same config and initial world
+    the search carries on exactly as if it had never stopped, config.total_counter still counts from the original start.
+    :return: Search_Result
+    '''
+    if config.search_engine != 'dfs':
+        raise ValueError('Only the dfs search engine can be resumed from a checkpoint.')
+
+    return depth_first_search(config, initial_world, checkpoint=checkpoint)
+
+
+def best_node_metadata(config, best_node, initial_utility, seed=None):
+    '''text of the {TIMESTAMP}_best_node_metadata.txt file'''
+
+    return (f"Final Global Utility {best_node.global_utility}\n"
+            f"Utility Delta (from Initial State): {best_node.global_utility - initial_utility}\n"
+            f"Max Depth: {config.max_depth}\n"
+            f"Sort Strategy: {config.sort_strategy}\n"
+            f"Search Engine: {config.search_engine}\n"
+            f"Seed: {seed}\n"
+            )
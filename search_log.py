@@ -0,0 +1,193 @@
+import os
+import csv
+import queue
+import threading
+import numpy as np
+
+# one record per step, same columns as the old node_log.csv
+NODE_LOG_DTYPE = np.dtype([('step', '<i8'), ('global_util', '<f8'), ('depth', '<i4'), ('count_remaining', '<i8')])
+
+TRANSACTION_LOG_HEADERS = ['Model_ID', 'Global_Utility', 'Depth', 'Action_Type', 'Actor', 'Target', 'Action', 'Quantity']
+
+
+def read_node_log(filename):
+    '''
+    load a {TIMESTAMP}_node_log.bin file written by Search_Log
+    :return: numpy structured array with NODE_LOG_DTYPE columns, pd.DataFrame(read_node_log(...)) gives the old csv layout
+    '''
+    return np.fromfile(filename, dtype=NODE_LOG_DTYPE)
+
+
+class Search_Log(object):
+    '''
+    Output files of one search, written in batches on a background thread so the search never waits on the disk.
+    Steps go into a fixed size columnar buffer that is handed to the writer once full, nothing else is kept in memory.
+    New best nodes (transaction rows and metadata) are queued as they are found, the metadata file is written once per batch.
+    prefix: path prefix of the output files (output dir + timestamp), None to log nothing
+    buffer_size: steps held in memory before a batch is queued
+    max_pending: batches waiting for the writer before the search blocks
+    start_step: steps already in the node log when resuming, anything logged after them is dropped
+    transaction_offset: size in bytes of the transaction list when resuming (see transaction_offset()), rows written after it are dropped
+    '''
+
+    def __init__(self, prefix, buffer_size=65536, max_pending=4, start_step=0, transaction_offset=None):
+        self.prefix = prefix
+        self.buffer_size = max(1, buffer_size)
+
+        self.buffer = np.zeros(self.buffer_size, dtype=NODE_LOG_DTYPE)
+        self.buffered = 0
+        self.next_step = start_step
+
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.writer = None
+
+        if prefix is None:
+            return
+
+        self.node_log_filename = f'{prefix}_node_log.bin'
+        self.transaction_filename = f'{prefix}_best_node_transaction_list.csv'
+        self.metadata_filename = f'{prefix}_best_node_metadata.txt'
+
+        # a resumed search continues the files of the interrupted one, truncated to the checkpoint
+        if start_step > 0 and os.path.exists(self.node_log_filename):
+            self.node_log_file = open(self.node_log_filename, 'r+b')
+            self.node_log_file.truncate(start_step * NODE_LOG_DTYPE.itemsize)
+            self.node_log_file.seek(0, os.SEEK_END)
+
+        else:
+            self.node_log_file = open(self.node_log_filename, 'wb')
+
+        new_transaction_log = start_step == 0 or not os.path.exists(self.transaction_filename)
+
+        # best nodes found again after the checkpoint come back with the same Model_ID, drop the rows written after it
+        if not new_transaction_log and transaction_offset is not None:
+            os.truncate(self.transaction_filename, transaction_offset)
+
+        self.transaction_file = open(self.transaction_filename, 'w' if new_transaction_log else 'a', newline='')
+        self.transaction_writer = csv.writer(self.transaction_file)
+
+        if new_transaction_log:
+            self.transaction_writer.writerow(TRANSACTION_LOG_HEADERS)
+
+        self.writer = threading.Thread(target=self.write_batches, name='search-log-writer', daemon=True)
+        self.writer.start()
+
+    def __repr__(self):
+        return f'{type(self).__name__}(Prefix={self.prefix}, Steps={self.next_step}, Buffered={self.buffered}, Pending={self.queue.qsize()})'
+
+    def step(self, global_utility, depth, count_remaining):
+        '''log one step, O(1) and allocation free until the buffer fills'''
+        record = self.buffer[self.buffered]
+        record['step'] = self.next_step
+        record['global_util'] = global_utility
+        record['depth'] = depth
+        record['count_remaining'] = count_remaining
+
+        self.next_step += 1
+        self.buffered += 1
+
+        if self.buffered == self.buffer_size:
+            self.flush_buffer()
+
+    def best(self, model_id, global_utility, depth, actions, metadata):
+        '''
+        log a new best node
+        actions: transactions from the initial world to the node, see Simulation_Node.extract_transaction_sequence
+        metadata: text of the best node metadata file
+        '''
+        if self.writer is None:
+            return
+
+        rows = [[model_id, global_utility, depth, *action] for action in actions]
+        self.put(('best', rows, metadata))
+
+    def flush_buffer(self):
+        if self.buffered == 0:
+            return
+
+        if self.writer is not None:
+            self.put(('steps', self.buffer[:self.buffered].copy(), None))
+
+        self.buffered = 0
+
+    def put(self, item):
+        if self.error is not None:
+            raise self.error
+
+        self.queue.put(item)
+
+    def flush(self):
+        '''hand over the buffered steps and wait until everything queued is on disk'''
+        self.flush_buffer()
+
+        if self.writer is not None:
+            self.queue.join()
+
+        if self.error is not None:
+            raise self.error
+
+    def transaction_offset(self):
+        '''size in bytes of the transaction list once everything queued is on disk, None when nothing is logged'''
+        self.flush()
+
+        if self.writer is None:
+            return None
+
+        return os.fstat(self.transaction_file.fileno()).st_size
+
+    def close(self):
+        '''flush and stop the writer thread, the log cannot be used afterwards'''
+        self.flush()
+
+        if self.writer is None:
+            return
+
+        self.queue.put(None)
+        self.writer.join()
+        self.writer = None
+
+        self.node_log_file.close()
+        self.transaction_file.close()
+
+    def write_batches(self):
+        '''writer thread: drains everything queued, writes it, then flushes each file once'''
+        running = True
+
+        while running:
+            batch = [self.queue.get()]
+
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            metadata = None
+
+            try:
+                for item in batch:
+
+                    if item is None:
+                        running = False
+
+                    elif item[0] == 'steps':
+                        item[1].tofile(self.node_log_file)
+
+                    else:
+                        self.transaction_writer.writerows(item[1])
+                        metadata = item[2]
+
+                # only the latest best node matters for the metadata file
+                if metadata is not None:
+                    with open(self.metadata_filename, 'w') as f:
+                        f.write(metadata)
+
+                self.node_log_file.flush()
+                self.transaction_file.flush()
+
+            except Exception as e:
+                self.error = e
+
+            for _ in batch:
+                self.queue.task_done()
@@ -1,11 +1,15 @@
-import secrets
 import csv
+import numpy as np
 
-from copy import deepcopy
-from collections import Counter
-from random import shuffle, randrange
+from hashlib import blake2b
+
+from random import Random
 from math import floor
 
+from action import CREATE, TRANSFER, TYPE_SHIFT, unpack_action, unpack_actions
+from option_queue import Option_Stream, Utility_Stream, drop_random
+from instrumentation import Search_Stats
+
 from config.simulation_configuration import (
     MINIMUM_TRANSFER,
     CREATE_INTERVALS,
@@ -37,20 +41,34 @@ class Simulation_Orchestrator(object):
 
 class Simulation_Node(Simulation_Orchestrator):
 
-    def __init__(self, country_list, turn_tracker, parent_node=None, depth=1, global_utility=-1, possible_actions=dict(), action_taken=''):
-        # store countries and resources in global simulation
-        self.country_dict = country_list
+    def __init__(self, world_state, turn_tracker, parent_node=None, depth=1, global_utility=-1, possible_actions=None, action_taken=None, rng=None, stats=None,
+                 option_cache=None):
+        # store countries and resources in global simulation.  world_state is shared by every node on the search path,
+        # it holds the state of the deepest node and is rolled back in place by prev_node_state.
+        self.world = world_state
+        self.country_dict = world_state.country_dict()
         self.global_utility = global_utility
 
-        self.hex_name = secrets.token_hex(nbytes=16)
-        self.possible_actions = possible_actions  # possible actions apply to the country level, updated on each step of model
-        self.action_taken = action_taken          # actions taken at a specific node
+        # one seeded random.Random shared by every node of a search, the only source of randomness (see Search_Config.seed)
+        self.rng = Random() if rng is None else rng
+
+        # Search_Stats shared by every node of a search, disabled unless Search_Config.instrument is set
+        self.stats = Search_Stats() if stats is None else stats
+
+        # Option_Cache shared by every node of a search, None to work out each country's options every time
+        self.option_cache = option_cache
+
+        self.hex_name = f'{self.rng.getrandbits(128):032x}'
+        # possible actions apply to the country level, updated on each step of model.  Owned by this node, never shared with another.
+        self.possible_actions = dict() if possible_actions is None else possible_actions
+        self.action_taken = action_taken          # action code (see action.py) that produced this node from its parent
+        self.previous_utilities = None            # country utilities before action_taken, restored on backtrack
         self.parent_node = parent_node
         self.turn_tracker = turn_tracker
         self.country_acting = self.turn_tracker[depth]
         self.depth = depth
 
-        super().__init__(country_list)
+        super().__init__(world_state.tables.country_names)
 
     def __repr__(self):
 
@@ -63,32 +81,25 @@ class Simulation_Node(Simulation_Orchestrator):
             '''
 
 
-    def get_discount_rate(self):
+    def get_discount_rate(self, depth=None):
         '''Discounts returns based on depth level: more trades == higher depth == higher discount'''
         multiple = max(self.turn_tracker.keys()) // 3
 
-        if self.depth <= 1 * multiple:
+        if depth is None:
+            depth = self.depth
+
+        if depth <= 1 * multiple:
             return 1
 
-        elif self.depth <= 2 * multiple:
+        elif depth <= 2 * multiple:
             return 0.9
 
         else:
             return 0.8
 
     def track_previously_performed_events(self, parent_node_id, event, frontier):
-
-        if parent_node_id in frontier.keys():
-
-            # check if event occurred at a given parent node N
-            if event in frontier[parent_node_id]:
-                frontier[parent_node_id][event] += 1
-            else:
-                frontier[parent_node_id][event] = 1
-
-        # new parent node, add it to the tracker
-        else:
-            frontier[parent_node_id] = { event : 1 }
+        '''frontier: Search_Frontier'''
+        frontier.track(parent_node_id, event)
 
     def update_country_states(self, country_to_update):
         '''
@@ -97,22 +108,20 @@ class Simulation_Node(Simulation_Orchestrator):
         '''
         self.country_dict[country_to_update.name] = country_to_update
 
-    def transfer(self, source_country, target_country, resource, amount_transferred, verbose=False, shadow_mode=False):
+    def transfer(self, source_country, target_country, resource, amount_transferred, verbose=False, shadow_mode=False, discount=None):
+
+        if discount is None:
+            discount = self.get_discount_rate()
 
         if shadow_mode:
             # return event with util column added without changing self
-            shadow_copy_source_country = deepcopy(self.country_dict[source_country])
-            shadow_copy_target_country = deepcopy(self.country_dict[target_country])
+            delta = np.zeros(len(self.world.tables.resource_names))
+            delta[self.world.tables.resource_index[resource]] = amount_transferred
 
-            shadow_copy_source_country - {resource:amount_transferred}
-            shadow_copy_target_country + {resource:amount_transferred}
+            shadow_source_util = self.country_dict[source_country].shadow_util(-delta, discount=discount)
+            shadow_target_util = self.country_dict[target_country].shadow_util(delta, discount=discount)
 
-            discount = self.get_discount_rate()
-
-            shadow_copy_source_country.update_util(discount=discount)
-            shadow_copy_target_country.update_util(discount=discount)
-
-            net_util_benefit = shadow_copy_target_country.current_utility - shadow_copy_source_country.current_utility
+            net_util_benefit = shadow_target_util - shadow_source_util
 
             event = ('Transfer', source_country, target_country, resource, amount_transferred, net_util_benefit)
             return event
@@ -123,58 +132,39 @@ class Simulation_Node(Simulation_Orchestrator):
             self.country_dict[target_country] + {resource:amount_transferred}
 
             event = ('Transfer', source_country, target_country, resource, amount_transferred)
-            self.action_taken = event
 
             if verbose:
                 print(event)
 
             return event
 
-    def transform(self, country, template, qty = 1, verbose=False, shadow_mode=False):
+    def transform(self, country, template, qty = 1, verbose=False, shadow_mode=False, discount=None):
         '''
         Transforms resources to new things using existing resources of the country object.
         Function check_resources ensures sufficient resources exist, this carries out transforms which we know we can perform.
         :param template: tranform template i.e. "CreateAlloy"
+        :param discount: discount applied to the new utility, defaults to the discount rate of this node
         :return: None
         '''
-        to_expend = {}
-        to_create = {}
-
-        # self.country_dict[country] is a Country object not a pure dict, has some limitations
-        for resource in self.country_dict[country].templates[template]['Inputs'].keys():   # resource_input == water, population, etc.
-
-            # safety catch, this should never happen
-            if self.country_dict[country].templates[template]['Inputs'][resource] * qty > self.country_dict[country].resources[resource]:
+        tables = self.world.tables
 
-                raise ValueError(f'''Illegal Operation, cannot create {resource}, insufficient resources.  Resource check malfunction.
-                    Needed {self.country_dict[country].templates[template]['Inputs'][resource] * qty} but only {self.country_dict[country].resources[resource]}''')
+        to_expend = tables.template_inputs[template] * qty
+        to_create = tables.template_outputs[template] * qty
 
-            to_expend[resource] = self.country_dict[country].templates[template]['Inputs'][resource] * qty
+        # safety catch, this should never happen
+        if (to_expend > self.country_dict[country].resources).any():
 
-        for resource in self.country_dict[country].templates[template]['Outputs'].keys():
-            to_create[resource] = self.country_dict[country].templates[template]['Outputs'][resource] * qty
+            raise ValueError(f'''Illegal Operation, cannot create {template}, insufficient resources.  Resource check malfunction.
+                Needed {dict(zip(tables.resource_names, to_expend))} but only {self.country_dict[country].resource_dict()}''')
 
-
-        x = Counter(to_create)
-        y = Counter(to_expend)
-
-        y.subtract(x)
-
-        if verbose:
-            print(event)
+        if discount is None:
+            discount = self.get_discount_rate()
 
         if shadow_mode:
             # don't change self
-            shadow_copy_country = deepcopy(self.country_dict[country])
-
-            shadow_copy_country - to_expend
-            shadow_copy_country + to_create
-
-            discount = self.get_discount_rate()
+            shadow_util = self.country_dict[country].shadow_util(to_create - to_expend, discount=discount)
 
-            shadow_copy_country.update_util(discount=discount)
-
-            event = ('Create', country, country, template, qty, shadow_copy_country.current_utility)
+            event = ('Create', country, country, template, qty, shadow_util)
 
             return event
 
@@ -185,12 +175,12 @@ class Simulation_Node(Simulation_Orchestrator):
         # add output to resources
         self.country_dict[country] + to_create
 
-        discount = self.get_discount_rate()
-
         self.country_dict[country].update_util(discount=discount)
 
         event = ('Create', country, country, template, qty)
-        self.action_taken = event
+
+        if verbose:
+            print(event)
 
         return event
 
@@ -199,12 +189,7 @@ class Simulation_Node(Simulation_Orchestrator):
         '''
         Calculates and returns global utilization by taking the average of all current utilities
         '''
-        values = []
-
-        for country in self.country_dict.keys():
-            values.append(self.country_dict[country].current_utility)
-
-        global_utility = sum(values) / len(values)
+        global_utility = float(self.world.utilities.mean())
 
         if verbose:
             print(f"Global Utility: {global_utility}")
@@ -213,100 +198,188 @@ class Simulation_Node(Simulation_Orchestrator):
 
 
     def calculate_utilization_of_options(self, options_list):
+        '''
+        Prices every option in a single batch.  Each option is reduced to its change in weighted sum and population,
+        which is applied to the running weighted sum of the country receiving it (and taken away from the sender for transfers),
+        then all utilities are computed at once.  Cost per option does not depend on the number of resources.
+        :param options_list: list of action codes
+        :return: list of (action code, util) tuples
+        '''
+        if len(options_list) == 0:
+            return []
 
-        output_list = []
+        tables = self.world.tables
 
-        for option in options_list:
+        kinds, sender, receiver, items, quantities = unpack_actions(np.array(options_list, dtype=np.int64))
+        is_transfer = kinds == TRANSFER
+        is_create = ~is_transfer
 
-            if option[0] == 'Create':
-                outcome = self.transform(option[1],
-                                         template=option[3],
-                                         qty=option[4],
-                                         shadow_mode=True)
+        weighted_deltas = np.empty(len(options_list))
+        population_deltas = np.empty(len(options_list))
 
-            elif option[0] == 'Transfer':
-                outcome = self.transfer(source_country=option[1],
-                                         target_country=option[2],
-                                         resource=option[3],
-                                         amount_transferred=option[4],
-                                         shadow_mode=True)
+        weighted_deltas[is_create] = tables.template_weighted_delta_array[items[is_create]] * quantities[is_create]
+        population_deltas[is_create] = tables.template_population_delta_array[items[is_create]] * quantities[is_create]
 
-            else:
-                raise ValueError('Unknown command in option list')
+        weighted_deltas[is_transfer] = tables.weights[items[is_transfer]] * quantities[is_transfer]
+        population_deltas[is_transfer] = np.where(items[is_transfer] == tables.population_index, quantities[is_transfer], 0)
 
-            output_list.append(outcome)
+        discount = self.get_discount_rate()
+        weighted_sums = self.world.current_weighted_sums()
+        population = self.world.resources[:, tables.population_index]
 
-        return output_list
+        # creates price the acting country, transfers price net benefit of target over source (see transfer())
+        receiver_util = (weighted_sums[receiver] + weighted_deltas) / (population[receiver] + population_deltas) * discount
 
+        transfer_sender = sender[is_transfer]
+        sender_util = (weighted_sums[transfer_sender] - weighted_deltas[is_transfer]) / (population[transfer_sender] - population_deltas[is_transfer]) * discount
+        receiver_util[is_transfer] -= sender_util
 
-    def get_options(self, minimum_transfer, intervals_to_check, frontier, sort_method='std', max_repeats=3, reduction_limit=0.9):
-        # Options recalculated at each node, for each acting country, based on changing resources.
+        return list(zip(options_list, receiver_util.tolist()))
+
+
+    def price_option(self, code):
+        '''util of one option (action code) at this node, the same arithmetic as calculate_utilization_of_options'''
+        started = self.stats.start()
+
+        tables = self.world.tables
+        kind, sender, receiver, item, quantity = unpack_action(code)
+
+        weighted_sums = self.world.current_weighted_sums()
+        population = self.world.resources[:, tables.population_index]
+        discount = self.get_discount_rate()
+
+        if kind == CREATE:
+            util = ((float(weighted_sums[receiver]) + float(tables.template_weighted_delta_array[item]) * quantity)
+                    / (float(population[receiver]) + float(tables.template_population_delta_array[item]) * quantity) * discount)
+
+        else:
+            weighted_delta = float(tables.weights[item]) * quantity
+            population_delta = quantity if item == tables.population_index else 0
+
+            util = ((float(weighted_sums[receiver]) + weighted_delta) / (float(population[receiver]) + population_delta) * discount
+                    - (float(weighted_sums[sender]) - weighted_delta) / (float(population[sender]) - population_delta) * discount)
+
+        self.stats.stop('price_options', started)
+
+        return util
+
+    def utility_stream(self, options, descending=True):
+        '''
+        Utility_Stream over options (action codes).  With a fixed population, among the creates or among the transfers to one country
+        an option's util only grows with its change in weighted sum, a fixed product of weight and quantity.  Each of those groups is
+        put in order by that product and only the options reaching the front of the stream get priced.
+        descending: highest util first, False for lowest first
+        '''
+        tables = self.world.tables
+
+        if len(options) == 0:
+            return Utility_Stream([], descending=descending)
+
+        if not tables.fixed_population:
+            # utils are not monotone in the weighted sum change, price everything and order it up front
+            priced = sorted(enumerate(self.calculate_utilization_of_options(options)), key=lambda x: x[1][1], reverse=descending)
+
+            return Utility_Stream([[(n, code) for n, (code, _) in priced]], descending=descending)
+
+        codes = np.array(options, dtype=np.int64)
+        kinds, _, targets, items, quantities = unpack_actions(codes)
+        is_create = kinds == CREATE
+
+        changes = np.empty(len(options))
+        changes[is_create] = tables.template_weighted_delta_array[items[is_create]] * quantities[is_create]
+        changes[~is_create] = tables.weights[items[~is_create]] * quantities[~is_create]
+
+        # creates target the acting country and transfers never do, so the target alone names the group.  Different changes can
+        # round to the same util, the stream puts those back in original order.
+        order = np.lexsort((-changes if descending else changes, targets))
+        targets = targets[order]
+
+        bounds = (np.flatnonzero(targets[1:] != targets[:-1]) + 1).tolist()
+        pairs = list(zip(order.tolist(), codes[order].tolist()))
 
+        return Utility_Stream([pairs[a:b] for a, b in zip([0, *bounds], [*bounds, len(pairs)])], descending=descending)
+
+    def get_options(self, minimum_transfer, intervals_to_check, frontier, sort_method='std', max_repeats=3, reduction_limit=0.9):
+        '''
+        Generates the options of the acting country into possible_actions, in sort_method order.  Nothing is priced here, options
+        are priced as next_node_state takes them (see option_queue.Option_Stream), so a node only needs this once.
+        :return: list of action codes generated
+        '''
         if self.parent_node is None:
             parent_identifier = 'top_level_node'
 
         else:
             parent_identifier = self.parent_node.hex_name
 
+        stats = self.stats
+        started = stats.start()
+
         options =  self.country_dict[self.country_acting].generate_country_options(self.country_dict.keys(),
                                                         parent_node_id=parent_identifier,
                                                         frontier=frontier,
                                                         minimum_transfer=minimum_transfer,
                                                         intervals_to_check=intervals_to_check,
-                                                        max_repeats=max_repeats)
+                                                        max_repeats=max_repeats,
+                                                        cache=self.option_cache)
+
+        stats.stop('generate_options', started)
+        stats.count('options', len(options))
 
-        # price out all options, apply sorting method here!
-        options_with_util = self.calculate_utilization_of_options(options)
+        # apply sorting method here, pricing waits for the stream
+        started = stats.start()
 
         if sort_method == 'std':
-            sorted_options = options_with_util
+            stream = Option_Stream(options)
 
         elif sort_method == 'create_first':
-            sorted_options = sorted(options_with_util, key=lambda x: x[0], reverse=False)
+            stream = Option_Stream(sorted(options, key=lambda x: x >> TYPE_SHIFT, reverse=False))
 
         elif sort_method == 'transfer_first':
-            sorted_options = sorted(options_with_util, key=lambda x: x[0], reverse=True)
+            stream = Option_Stream(sorted(options, key=lambda x: x >> TYPE_SHIFT, reverse=True))
 
         elif sort_method == 'utility_first':
-            sorted_options = sorted(options_with_util, key=lambda x: x[5], reverse=True)
+            stream = self.utility_stream(options, descending=True)
 
         elif sort_method == 'utility_first_and_reduce':
-            sorted_options = sorted(options_with_util, key=lambda x: x[5], reverse=True)
+            reduction_limit = floor(len(options) * reduction_limit)
+            kept = options
 
-            reduction_limit = floor(len(sorted_options) * reduction_limit)
-
-            # if down to 3 options, do not remove anything
+            # if down to 3 options, do not remove anything.  Positions dropped from the sorted list are a uniform random subset
+            # of the options, so drop them before anything is ordered or priced.
             if reduction_limit > 3:
+                kept = drop_random(options, reduction_limit, self.rng)
 
-                for x in range(0, reduction_limit):
-                    sorted_options.pop(randrange(len(sorted_options)))
-
+            stream = self.utility_stream(kept, descending=True)
 
         elif sort_method == 'utility_last':
-            sorted_options = sorted(options_with_util, key=lambda x: x[5], reverse=False)
+            stream = self.utility_stream(options, descending=False)
 
         elif sort_method == 'random':
-            shuffle(options_with_util)
-            sorted_options = options_with_util
+            shuffled = list(options)
+            self.rng.shuffle(shuffled)
+            stream = Option_Stream(shuffled)
 
         elif sort_method == 'random_and_reduce':
 
             # remove ~20% of list elements randomly
-            reduction_limit = floor(len(options_with_util) * reduction_limit)
+            reduction_limit = floor(len(options) * reduction_limit)
 
-            # if down to 3 options, do not remove anything
+            # if down to 3 options, do not remove anything.  sample returns the kept options already shuffled.
             if reduction_limit > 3:
+                shuffled = self.rng.sample(options, len(options) - reduction_limit)
 
-                for x in range(0, reduction_limit):
-                    options_with_util.pop(randrange(len(options_with_util)))
+            else:
+                shuffled = list(options)
+                self.rng.shuffle(shuffled)
 
-            shuffle(options_with_util)
-            sorted_options = options_with_util
+            stream = Option_Stream(shuffled)
 
         else:
             raise ValueError('Invalid sort method.')
 
-        self.possible_actions[self.country_acting] = sorted_options
+        stream.price = self.price_option
+        self.possible_actions[self.country_acting] = stream
+        stats.stop('sort_options', started)
 
         return options
 
@@ -315,99 +388,223 @@ class Simulation_Node(Simulation_Orchestrator):
         return node that is one node up on the graph
         '''
 
-        prev_node = deepcopy(self.parent_node)
-
         if log_no_action and verbose:
             print(f'{self.depth} {self.country_acting} No action, up one node.')
 
-        # things from self are preserved as we move upward to a parent node.  We need to roll back depth and parent.parent to keep history.
-        # self.country_dict contains history, need to keep track to apply logic based on what we've done so far.
-        return self.__class__(
-            prev_node.country_dict,
-            parent_node=prev_node.parent_node,
-            global_utility=prev_node.global_utility,
-            turn_tracker=prev_node.turn_tracker,
-            possible_actions=prev_node.possible_actions,
-            action_taken=prev_node.action_taken,               # roll back everything expect actions taken.
-            depth=prev_node.depth
-            )
+        # only the world is shared, the parent node itself is unchanged.  Roll the world back to the parent's state.
+        started = self.stats.start()
+        self.undo_action()
+        self.stats.stop('backtrack', started)
+
+        return self.parent_node
+
+    def undo_action(self):
+        '''
+        Applies the inverse of action_taken to the shared world and restores utilities, the world is left as it was at the parent.
+        Only valid for the deepest node on the path.
+        '''
+        tables = self.world.tables
+        kind, actor, target, item, quantity = unpack_action(self.action_taken)
+
+        if kind == CREATE:
+            self.country_dict[tables.country_names[actor]] - tables.template_deltas[tables.template_names[item]] * quantity
+
+        else:
+            resource = tables.resource_names[item]
+            self.country_dict[tables.country_names[actor]] + {resource: quantity}
+            self.country_dict[tables.country_names[target]] - {resource: quantity}
+
+        self.world.utilities[:] = self.previous_utilities
+
+    def state_key(self):
+        '''
+        hash of (depth, country acting, resources, utilities), identical worlds reached by different action orders share a key.
+        Utilities are part of the state: they depend on the path (transfers do not refresh them, creates keep their discount).
+        Uses blake2b rather than hash() so keys are the same in every process and survive a checkpoint.
+        '''
+        digest = blake2b(f'{self.depth}|{self.country_acting}|'.encode(), digest_size=8)
+        digest.update(self.world.resources.tobytes())
+        digest.update(self.world.utilities.tobytes())
 
-    def next_node_state(self, frontier, verbose=False, minimum_transfer=[200], intervals_to_check=[100,10]):
+        return int.from_bytes(digest.digest(), 'little')
+
+    def next_node_state(self, frontier, verbose=False, minimum_transfer=[200], intervals_to_check=[100,10], transpositions=None):
+        '''
+        Takes the next action off possible_actions and returns (child node, frontier).
+        transpositions: optional Transposition_Table, actions leading to a state already explored are skipped.
+            Returns (None, frontier) if every remaining action leads to an explored state.
+        '''
 
         country = self.country_acting
 
-        for next_move in self.possible_actions[country]:
+        # actions are priced at the depth they are taken from
+        discount = self.get_discount_rate()
+
+        if self.parent_node is None:
+            parent_identifier = 'top_level_node'
+
+        else:
+            parent_identifier = self.parent_node.hex_name
+
+        queue = self.possible_actions[country]
+        stats = self.stats
+
+        while len(queue) > 0:
+            next_move = queue.pop()
+            started = stats.start()
+
+            # (action code, util), the code decodes to
             #  What,        From,      To,          Material,      Amount
             # ('Create',   'Atlantis', 'Atlantis', 'CreateAlloys', 1)
             # ('Transfer', 'Atlantis', 'Carpania', 'Water',        100)
 
-            if next_move[0] == 'Create':
-                outcome = self.transform(self.country_dict[country].name, template = next_move[3], qty = next_move[4], verbose=verbose)
+            next_node = self.advance(next_move[0], discount=discount, verbose=verbose)
+            outcome = next_node.action_taken
 
-                self.update_global_expected_utiliziation()
-                self.update_country_states(self.country_dict[country])
+            self.track_previously_performed_events(parent_identifier, outcome, frontier)
+            stats.stop('transition', started)
 
-            elif next_move[0] == 'Transfer':
-                outcome = self.transfer(self.country_dict[country].name, next_move[2], next_move[3], next_move[4], verbose=verbose)
+            started = stats.start()
+            explored = transpositions is not None and transpositions.seen(next_node.state_key())
+            stats.stop('transposition', started)
 
-                self.update_global_expected_utiliziation()
-                self.update_country_states(self.country_dict[country])
-                self.update_country_states(self.country_dict[next_move[2]])
+            if explored:
+                # same world already reached at this depth through another order of actions, its subtree is explored.
+                if verbose:
+                    print(f'{self.depth} {self.country_acting} {self.world.tables.decode_action(outcome)} transposition, skipped')
 
-            else:
-                raise ValueError("Illegal Transformation Detected.")
+                started = stats.start()
+                next_node.undo_action()
+                stats.stop('backtrack', started)
+                stats.count('transpositions_skipped')
+                continue
 
-            if self.parent_node is None:
-                parent_identifier = 'top_level_node'
+            if verbose:
+                print(f'{self.depth} {self.country_acting} {self.world.tables.decode_action(outcome)}')
 
-            else:
-                parent_identifier = self.parent_node.hex_name
+            # only single action takend off possible_actions
+            return (next_node, frontier)
 
-            self.track_previously_performed_events(parent_identifier, outcome, frontier)
-            self.possible_actions[country].remove(next_move)
+        return (None, frontier)
 
-            if verbose:
-                print(f'{self.depth} {self.country_acting} {outcome}')
+    def apply_action(self, action, discount, verbose=False):
+        '''
+        Performs action (an action code) on this node's world, records it as action_taken and updates global utility.
+        :return: event tuple, the decoded action
+        '''
+        self.previous_utilities = self.world.utilities.copy()
 
-            # only single action takend off possible_actions
-            break
+        kind, actor, target, item, quantity = self.world.tables.decode_action(action)
+
+        if kind == 'Create':
+            outcome = self.transform(actor, template = item, qty = quantity, verbose=verbose, discount=discount)
+
+        else:
+            outcome = self.transfer(actor, target, item, quantity, verbose=verbose, discount=discount)
 
+        self.action_taken = action
+        self.update_global_expected_utiliziation()
+
+        return outcome
+
+    def advance(self, action, discount=None, verbose=False):
+        '''
+        Returns a child node for action, acting on the shared world in place.  The child keeps what it needs to undo the action.
+        '''
         # https://stackoverflow.com/questions/4996565/idiomatic-python-for-generating-a-new-object-from-within-a-class
-        return (self.__class__(self.country_dict,
-            # history=self.history,
-            parent_node=self.parent_node,
+        next_node = self.__class__(self.world,
+            parent_node=self,
             global_utility=self.global_utility,
             turn_tracker=self.turn_tracker,
-            possible_actions=self.possible_actions,
-            action_taken=self.action_taken,
-            depth=self.depth + 1),
-            frontier)
+            depth=self.depth + 1,
+            rng=self.rng,
+            stats=self.stats,
+            option_cache=self.option_cache)
 
-    def extract_transaction_sequence(self, filename=None):
+        # actions are priced at the depth they are taken from
+        if discount is None:
+            discount = self.get_discount_rate()
+
+        next_node.apply_action(action, discount=discount, verbose=verbose)
+
+        return next_node
+
+    def branch(self, action, verbose=False):
+        '''
+        Returns a child node for action with its own copy of the world, self is unchanged.
+        Used by search engines that jump between nodes instead of walking one path.
+        '''
+        started = self.stats.start()
+
+        next_node = self.__class__(self.world.copy(),
+            parent_node=self,
+            global_utility=self.global_utility,
+            turn_tracker=self.turn_tracker,
+            depth=self.depth + 1,
+            rng=self.rng,
+            stats=self.stats,
+            option_cache=self.option_cache)
+
+        next_node.apply_action(action, discount=self.get_discount_rate(), verbose=verbose)
+
+        self.stats.stop('branch', started)
+        self.stats.count('copied_bytes', self.world.nbytes())
+
+        return next_node
 
-        # do not change self, perform calculation and step through on a copy of self
-        starting_node = deepcopy(self)
+    def expected_global_utility(self, option):
+        '''global utility of the child that option (action code, util) would produce, see calculate_utilization_of_options'''
+        utilities = self.world.utilities
+        kind, country, _, _, _ = unpack_action(option[0])
 
-        # ensures a unique node name for telling model data apart from one another
-        salt = str(secrets.randbelow(500000)).zfill(6)
+        # transfers do not update utilities, only creates change global utility
+        if kind == CREATE:
+            return float((utilities.sum() - utilities[country] + option[1]) / len(utilities))
+
+        return float(utilities.mean())
+
+    def available_options(self, minimum_transfer, intervals_to_check):
+        '''action codes of every option of the acting country, unpriced, without frontier filtering or sorting'''
+        return self.country_dict[self.country_acting].generate_country_options(self.country_dict.keys(),
+                                                        parent_node_id=None,
+                                                        frontier={},
+                                                        minimum_transfer=minimum_transfer,
+                                                        intervals_to_check=intervals_to_check,
+                                                        cache=self.option_cache)
+
+    def priced_options(self, minimum_transfer, intervals_to_check):
+        '''(action code, util) of every option of the acting country, without frontier filtering or sorting'''
+        return self.calculate_utilization_of_options(self.available_options(minimum_transfer, intervals_to_check))
+
+    def model_id(self, salt=0):
+        '''
+        unique node name for telling model data apart from one another in the transaction logs
+        salt: number appended to the name, the search passes the step the node was found at
+        '''
+        return self.hex_name + '_' + str(salt).zfill(6)
+
+    def extract_transaction_sequence(self, filename=None):
+        '''actions from the root to this node as decoded action tuples, appended to filename as csv rows if given'''
+        decode_action = self.world.tables.decode_action
 
         transactions = []
+        starting_node = self
 
+        # walk parent pointers back to the root, each node holds the action that produced it.  O(depth), nothing is copied.
         while starting_node.parent_node is not None:
 
-            transactions.append(starting_node.action_taken)
-            starting_node = starting_node.prev_node_state()
-
-        # include the first transaction.  We are backing out of the tree so the first transaction gets recorded last.
-        transactions.append(starting_node.action_taken)
+            transactions.append(decode_action(starting_node.action_taken))
+            starting_node = starting_node.parent_node
 
         list_output = list(reversed(transactions))
 
         if filename:
+            model_id = self.model_id()
+
             with open(filename, 'a') as f:
 
                 wr = csv.writer(f)
                 for row in list_output:
-                    wr.writerow([(self.hex_name + '_' + salt), self.global_utility, self.depth, *row])
+                    wr.writerow([model_id, self.global_utility, self.depth, *row])
 
         return list_output
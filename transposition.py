@@ -0,0 +1,35 @@
+from collections import OrderedDict
+
+from lru import LRU_Table
+
+
+class Transposition_Table(LRU_Table):
+    '''
+    Bounded set of explored state keys (see Simulation_Node.state_key) with least recently used eviction.
+    max_size: number of keys kept, the oldest untouched key is dropped once full
+    '''
+
+    def __init__(self, max_size=100000):
+        super().__init__(max_size)
+
+    def seen(self, key):
+        '''
+        True if key was explored before (and marks it recently used), otherwise records key and returns False
+        '''
+        if self.get(key) is not None:
+            return True
+
+        self.put(key, True)
+
+        return False
+
+    @classmethod
+    def from_state(cls, state, max_size=100000):
+        '''rebuild a table from Search_Checkpoint.transposition_state'''
+        keys, hits, misses, evictions = state
+
+        table = cls(max_size=max_size)
+        table.table = OrderedDict.fromkeys(keys[-max_size:], True)
+        table.hits, table.misses, table.evictions = hits, misses, evictions
+
+        return table
@@ -0,0 +1,296 @@
+import os
+import csv
+import json
+import pickle
+import tempfile
+import numpy as np
+
+from action import CREATE, TRANSFER, ACTION_TYPES, pack_action, unpack_action
+from country import Country
+
+
+def parse_value(value):
+    '''CSV cell to bool, int, float or str, the same types the old pandas parser produced'''
+    if value in ('True', 'False'):
+        return value == 'True'
+
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+
+    return value
+
+
+def csv_to_json_parser(csv_data, orient):
+    '''
+    Read a CSV file whose first column is the row index.
+    orient: 'index' for {row: {column: value}}, 'columns' for {column: {row: value}}
+    '''
+    with open(csv_data, newline='', encoding='utf-8-sig') as f:
+
+        reader = csv.reader(f)
+        columns = next(reader)[1:]
+        rows = {row[0]: dict(zip(columns, map(parse_value, row[1:]))) for row in reader if row}
+
+    if orient == 'index':
+        return rows
+
+    elif orient == 'columns':
+        return {column: {index: row[column] for index, row in rows.items()} for column in columns}
+
+    raise ValueError('Invalid orient.')
+
+
+def load_config_files(init_state_data, init_resource_weights, templates, cache_file=None):
+    '''
+    Parse the three config files.  With cache_file the parsed form is pickled there and reused until any file's mtime or size changes.
+    :return: Tuple (state data by country, weight data by column, templates)
+    '''
+    sources = (init_state_data, init_resource_weights, templates)
+    cache_key = None
+
+    if cache_file is not None:
+        cache_key = tuple((os.path.abspath(x), os.stat(x).st_mtime_ns, os.stat(x).st_size) for x in sources)
+
+        try:
+            with open(cache_file, 'rb') as f:
+                cached_key, parsed = pickle.load(f)
+
+            if cached_key == cache_key:
+                return parsed
+
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            pass
+
+    with open(templates) as input_file:
+        template_dict = json.loads(input_file.read())
+
+    parsed = (csv_to_json_parser(init_state_data, orient='index'),
+              csv_to_json_parser(init_resource_weights, orient='columns'),
+              template_dict)
+
+    if cache_file is not None:
+        # each writer gets its own temp file so runs starting together never rename each other's, a cache that cannot be written
+        # (read only directory, full disk) is just a miss
+        temp_filename = None
+
+        try:
+            handle, temp_filename = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(cache_file)), suffix='.tmp')
+
+            with os.fdopen(handle, 'wb') as f:
+                pickle.dump((cache_key, parsed), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            os.replace(temp_filename, cache_file)
+
+        except OSError:
+            if temp_filename is not None and os.path.exists(temp_filename):
+                os.remove(temp_filename)
+
+    return parsed
+
+
+class World_Tables(object):
+    '''
+    Immutable tables shared by every World_State in a simulation.  Built once, never copied.
+    country_names: countries in play, gives the row order of the state array
+    resource_names: every resource known to the simulation, gives the column order of the state array
+    resource_weights: dict of resource -> weight used in the utility function
+    resource_transferable: dict of resource -> True/False
+    templates: dict loaded from templates.json
+    '''
+
+    def __init__(self, country_names, resource_names, resource_weights, resource_transferable, templates):
+
+        self.country_names = tuple(country_names)
+        self.resource_names = tuple(resource_names)
+
+        self.country_index = {name: n for n, name in enumerate(self.country_names)}
+        self.resource_index = {name: n for n, name in enumerate(self.resource_names)}
+
+        # if we encouter resources that do not have defined weights/transferaility, assume weight 0 and not transferable.
+        self.resource_weights = {r: resource_weights.get(r, 0) for r in self.resource_names}
+        self.resource_transferable = {r: resource_transferable.get(r, False) is True for r in self.resource_names}
+        self.templates = templates
+
+        self.weights = np.array([self.resource_weights[r] for r in self.resource_names], dtype=np.float64)
+        self.transferable = np.array([self.resource_transferable[r] for r in self.resource_names], dtype=bool)
+        self.population_index = self.resource_index['Population']
+
+        # template inputs/outputs as dense vectors over resource_names, multiply by qty to get a transform
+        self.template_inputs = {}
+        self.template_outputs = {}
+        self.template_deltas = {}
+
+        for template, blueprint in templates.items():
+            self.template_inputs[template] = self.resource_vector(blueprint['Inputs'])
+            self.template_outputs[template] = self.resource_vector(blueprint['Outputs'])
+            self.template_deltas[template] = self.template_outputs[template] - self.template_inputs[template]
+
+        # change in weighted sum / population from one unit of each template, used for incremental utility
+        self.template_weighted_deltas = {t: float(delta @ self.weights) for t, delta in self.template_deltas.items()}
+        self.template_population_deltas = {t: float(delta[self.population_index]) for t, delta in self.template_deltas.items()}
+
+        # compiled form for option generation: one row of inputs per template, transferable resources as indices
+        self.template_names = tuple(templates.keys())
+        self.template_input_matrix = np.array([self.template_inputs[t] for t in self.template_names]).reshape(len(self.template_names), len(self.resource_names))
+        self.template_input_mask = self.template_input_matrix > 0
+        self.transferable_indices = np.flatnonzero(self.transferable)
+        self.template_index = {name: n for n, name in enumerate(self.template_names)}
+
+        # per unit weighted sum / population deltas in template_names order, indexed by the item of a Create action code
+        self.template_weighted_delta_array = np.array([self.template_weighted_deltas[t] for t in self.template_names], dtype=np.float64)
+        self.template_population_delta_array = np.array([self.template_population_deltas[t] for t in self.template_names], dtype=np.float64)
+
+        # population never moves and no template changes it, so every country's population is fixed for the whole simulation
+        self.fixed_population = not self.transferable[self.population_index] and not self.template_population_delta_array.any()
+
+        for array in (self.weights, self.transferable, self.template_input_matrix, self.template_input_mask, self.transferable_indices,
+                      self.template_weighted_delta_array, self.template_population_delta_array,
+                      *self.template_inputs.values(), *self.template_outputs.values(), *self.template_deltas.values()):
+            array.flags.writeable = False
+
+    def utility(self, resources, discount=1):
+        '''
+        utility of one resource vector, or of every row of a (n x resources) matrix in one pass
+        weighted sum of resources divided by population, times the discount
+        '''
+        return (resources @ self.weights) / resources[..., self.population_index] * discount
+
+    def max_template_multipliers(self, resources):
+        '''
+        largest multiplier of each template (in template_names order) that resources can pay for, one vectorized min over all inputs
+        templates without inputs can be made in any quantity (inf)
+        '''
+        ratios = np.divide(resources, self.template_input_matrix, out=np.full(self.template_input_matrix.shape, np.inf), where=self.template_input_mask)
+
+        return np.floor(ratios.min(axis=1, initial=np.inf))
+
+    def encode_action(self, action):
+        '''
+        action tuple to action code (see action.py)
+        :param action: Tuple (action type, actor, target, template or resource, quantity), i.e. ('Transfer', 'Atlantis', 'Carpania', 'Water', 100)
+        '''
+        kind, actor, target, item, quantity = action[:5]
+
+        if kind == 'Create':
+            return pack_action(CREATE, self.country_index[actor], self.country_index[target], self.template_index[item], quantity)
+
+        elif kind == 'Transfer':
+            return pack_action(TRANSFER, self.country_index[actor], self.country_index[target], self.resource_index[item], quantity)
+
+        raise ValueError('Unknown command in option list')
+
+    def decode_action(self, code):
+        '''action code to the action tuple used for logging, the inverse of encode_action'''
+        kind, actor, target, item, quantity = unpack_action(code)
+
+        return (ACTION_TYPES[kind],
+                self.country_names[actor],
+                self.country_names[target],
+                self.template_names[item] if kind == CREATE else self.resource_names[item],
+                quantity)
+
+    def resource_vector(self, resource_dict):
+        '''converts a dict of resource -> amount into a dense vector over resource_names'''
+        vector = np.zeros(len(self.resource_names), dtype=np.float64)
+
+        for resource, amount in resource_dict.items():
+            vector[self.resource_index[resource]] = amount
+
+        return vector
+
+
+class World_State(object):
+    '''
+    Resources of every country in the simulation as one contiguous (countries x resources) array.
+    tables: World_Tables shared between all states of a simulation
+    resources: numpy array, one row per country in tables.country_names
+    utilities: numpy array, current utility of each country
+    weighted_sums: numpy array, resources @ weights of each country, kept up to date by Country.__add__/__sub__
+    '''
+
+    __slots__ = ('tables', 'resources', 'utilities', 'weighted_sums', 'countries')
+
+    def __init__(self, tables, resources, utilities, weighted_sums=None):
+        self.tables = tables
+        self.resources = resources
+        self.utilities = utilities
+        self.weighted_sums = resources @ tables.weights if weighted_sums is None else weighted_sums
+        self.countries = None
+
+    def __repr__(self):
+        return f'''
+        {type(self).__name__}(
+            Countries={self.tables.country_names}
+            Resources={self.tables.resource_names}
+            Utilities={self.utilities}
+            )
+            '''
+
+    @classmethod
+    def from_files(cls, countries, init_state_data, init_resource_weights, templates, cache_file=None):
+        '''
+        Parse the config files once and build the initial world.
+        countries: list of country names, these must appear in init_state_data
+        init_state_data: path to CSV file containing state data
+        init_resource_weights: path to CSV file containing resource weight data
+        templates: path to JSON object that represents templates (blueprints)
+        cache_file: path of the parsed config cache, None to always parse (see load_config_files)
+        '''
+        world_state, weights, template_dict = load_config_files(init_state_data, init_resource_weights, templates, cache_file=cache_file)
+
+        return cls.from_config(countries, world_state, weights, template_dict)
+
+    @classmethod
+    def from_config(cls, countries, world_state, weights, template_dict):
+        '''
+        Build the initial world from parsed config (see load_config_files), also used for generated worlds.
+        world_state: dict of country -> {resource: amount}
+        weights: dict with 'Weight' and 'Transferable' entries, each a dict of resource -> value
+        template_dict: dict of template -> {'Inputs': {resource: amount}, 'Outputs': {resource: amount}}
+        '''
+        # column order: resources in the state file, then weighted resources, then anything a template can produce
+        resource_names = list(world_state[countries[0]].keys())
+
+        for resource in weights['Weight']:
+            if resource not in resource_names:
+                resource_names.append(resource)
+
+        for blueprint in template_dict.values():
+            for resource in [*blueprint['Inputs'], *blueprint['Outputs']]:
+                if resource not in resource_names:
+                    resource_names.append(resource)
+
+        tables = World_Tables(countries, resource_names, weights['Weight'], weights['Transferable'], template_dict)
+
+        resources = np.array([tables.resource_vector(world_state[country]) for country in countries])
+        state = cls(tables, resources, np.zeros(len(countries), dtype=np.float64))
+
+        for country in state.country_dict().values():
+            country.update_util(util_init=True)
+
+        return state
+
+    def nbytes(self):
+        '''bytes held by the arrays of this state, what copy() allocates'''
+        return self.resources.nbytes + self.utilities.nbytes + self.weighted_sums.nbytes
+
+    def current_weighted_sums(self):
+        '''weighted sums options are priced from: the running weighted_sums, or a full recompute when Country.incremental_utility is off'''
+        if Country.incremental_utility:
+            return self.weighted_sums
+
+        return self.resources @ self.tables.weights
+
+    def copy(self):
+        '''new state with its own resource/utility arrays, tables are shared'''
+        return self.__class__(self.tables, self.resources.copy(), self.utilities.copy(), self.weighted_sums.copy())
+
+    def country_dict(self):
+        '''Country views over each row of this state, keyed by country name.  Built once per state and shared.'''
+        if self.countries is None:
+            self.countries = {name: Country(name, self) for name in self.tables.country_names}
+
+        return self.countries